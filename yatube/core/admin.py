@@ -0,0 +1,11 @@
+from django.contrib import admin
+
+from .models import Task
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'name', 'key', 'status', 'attempts', 'run_after')
+    list_filter = ('status', 'name')
+    search_fields = ('key',)
+    readonly_fields = ('locked_at', 'locked_by', 'error')
@@ -0,0 +1,21 @@
+"""Шаблонизатор Django, который отдаёт время рендеринга замеру
+core.middleware.PerformanceMiddleware."""
+from django.template.backends.django import DjangoTemplates, Template
+
+from .middleware import timed_rendering
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        with timed_rendering():
+            return super().render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        # Ошибки поиска шаблона обрабатывает родительский класс
+        template = super().get_template(template_name)
+        return TimedTemplate(template.template, self)
@@ -0,0 +1,123 @@
+"""Помощники бенчмарков: отдельная БД, генерация данных и замеры."""
+import datetime as dt
+import itertools
+import math
+import random
+import time
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.utils import timezone
+from faker import Faker
+from mixer.backend.django import Mixer
+
+from .utils import auto_now_add_disabled
+
+SEED = 1799
+TEXT_POOL_SIZE = 1000
+
+
+@contextmanager
+def benchmark_database(verbosity=0):
+    """Поднимает чистую тестовую БД, рабочие данные не трогаем."""
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(
+        verbosity=verbosity, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+
+
+@contextmanager
+def file_database(path, options, conn_max_age):
+    """Переключает соединения на новую файловую БД SQLite.
+
+    Тестовая БД SQLite живёт в памяти, а блокировки и журнал нужно
+    мерить на файле. Настройки меняются в общем settings_dict, поэтому
+    их видят и соединения других потоков.
+    """
+    settings_dict = connection.settings_dict
+    saved = {
+        key: settings_dict[key]
+        for key in ('NAME', 'OPTIONS', 'CONN_MAX_AGE')
+    }
+    connection.close()
+    settings_dict.update(
+        NAME=path, OPTIONS=options, CONN_MAX_AGE=conn_max_age)
+    try:
+        call_command('migrate', verbosity=0, interactive=False)
+        yield
+    finally:
+        connection.close()
+        settings_dict.update(saved)
+
+
+def seed(users, groups, posts, days=365, batch_size=5000):
+    """Заполняет БД воспроизводимым набором данных.
+
+    Авторы и группы создаются через mixer, посты - пачками через
+    bulk_create с текстами Faker и датами, размазанными по ``days`` дням.
+    """
+    from posts.models import Group, Post
+
+    rnd = random.Random(SEED)
+    fake = Faker('ru_RU')
+    fake.seed_instance(SEED)
+    mixer = Mixer(locale='ru_RU')
+    mixer.faker.seed_instance(SEED)
+    author_ids = [
+        user.pk for user in mixer.cycle(users).blend(
+            get_user_model(), username=mixer.sequence('bench_user_{0}'))
+    ]
+    group_ids = [
+        group.pk for group in mixer.cycle(groups).blend(
+            Group, slug=mixer.sequence('bench_group_{0}'))
+    ]
+    texts = [fake.text(max_nb_chars=300) for _ in range(TEXT_POOL_SIZE)]
+    now = timezone.now()
+    span = days * 24 * 60 * 60
+    rows = (
+        Post(
+            text=rnd.choice(texts),
+            author_id=rnd.choice(author_ids),
+            group_id=rnd.choice(group_ids) if rnd.random() < 0.8 else None,
+            pub_date=now - dt.timedelta(seconds=rnd.randrange(span)),
+        )
+        for _ in range(posts)
+    )
+    with auto_now_add_disabled(Post, 'pub_date'):
+        while True:
+            batch = list(itertools.islice(rows, batch_size))
+            if not batch:
+                break
+            with transaction.atomic():
+                Post.objects.bulk_create(batch)
+    return author_ids, group_ids
+
+
+def measure(func, repeat):
+    """Вызывает func repeat раз и возвращает длительности в мс."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def percentile(samples, percent):
+    """Перцентиль методом ближайшего ранга."""
+    ordered = sorted(samples)
+    rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def summary(samples):
+    return {
+        'p50': round(percentile(samples, 50), 3),
+        'p95': round(percentile(samples, 95), 3),
+        'p99': round(percentile(samples, 99), 3),
+    }
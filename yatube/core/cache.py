@@ -0,0 +1,16 @@
+"""Файловый кеш для счётчиков версий.
+
+FileBasedCache перед каждой записью перечисляет весь каталог кеша,
+чтобы решить, не пора ли вытеснять записи. Счётчиков версий по одному
+на автора и группу, а повышаются они при каждом сохранении поста,
+поэтому такая запись стоила бы O(число авторов). Вытеснять счётчики
+нельзя и не нужно: их столько же, сколько авторов и групп.
+"""
+from django.core.cache.backends.filebased import FileBasedCache
+
+
+class VersionFileCache(FileBasedCache):
+    """FileBasedCache без вытеснения: запись не читает каталог."""
+
+    def _cull(self):
+        pass
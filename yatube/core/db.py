@@ -0,0 +1,18 @@
+"""Настройка соединений SQLite под одновременные запросы.
+
+PRAGMA из SQLITE_PRAGMAS выполняются для каждого нового соединения
+сигналом connection_created. Главное из них - журнал WAL: читатели не
+ждут писателя и не мешают ему, а synchronous=NORMAL в этом режиме
+сбрасывает данные на диск при контрольных точках, а не при каждой
+транзакции. Ожидание занятой БД задаёт OPTIONS['timeout'], а
+переиспользование соединения между запросами - CONN_MAX_AGE.
+"""
+from django.conf import settings
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
@@ -0,0 +1,175 @@
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, close_old_connections, connection
+from django.test import override_settings
+
+from core.benchmark import SEED, file_database, percentile, seed
+
+# Режим: OPTIONS соединения, CONN_MAX_AGE и PRAGMA новых соединений.
+# WAL записывается в сам файл БД, поэтому режим по умолчанию задаёт
+# журнал явно.
+MODES = {
+    'по умолчанию': (
+        {}, 0, {'journal_mode': 'delete', 'synchronous': 'full'}),
+    'core.db': (
+        settings.DATABASES['default'].get('OPTIONS', {}),
+        settings.DATABASES['default'].get('CONN_MAX_AGE', 0),
+        settings.SQLITE_PRAGMAS,
+    ),
+}
+OPERATIONS = ('read', 'write')
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагружает файловую SQLite потоками, которые читают ленту и '
+        'публикуют посты, сначала с настройками SQLite по умолчанию, '
+        'затем с настройками core.db: пропускная способность, задержки, '
+        'ожидание в SQLite и ошибки "database is locked".'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--groups', type=int, default=10)
+        parser.add_argument('--posts', type=int, default=5000)
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument(
+            '--duration', type=float, default=5.0,
+            help='Сколько секунд длится нагрузка в каждом режиме.'
+        )
+        parser.add_argument(
+            '--write-share', type=float, default=0.2,
+            help='Доля операций записи.'
+        )
+
+    # Запись только ставит фоновые задачи, как в бою с обработчиком
+    @override_settings(DEBUG=False, TASKS_EAGER=False)
+    def handle(self, *args, **options):
+        for mode, (db_options, conn_max_age, pragmas) in MODES.items():
+            with tempfile.TemporaryDirectory() as directory, \
+                    override_settings(SQLITE_PRAGMAS=pragmas), \
+                    file_database(os.path.join(directory, 'load.sqlite3'),
+                                  db_options, conn_max_age):
+                self.stdout.write(f'Генерируем данные ({mode})...')
+                author_ids, _ = seed(
+                    options['users'], options['groups'], options['posts'])
+                baseline = self.baseline(author_ids)
+                results = self.load(author_ids, options)
+            self.report(mode, baseline, results, options)
+
+    @staticmethod
+    def operation(name, rnd, author_ids):
+        from posts.models import Post
+
+        if name == 'write':
+            Post.objects.create(
+                author_id=rnd.choice(author_ids), text='load')
+        else:
+            list(Post.objects.for_feed()[:10])
+
+    @staticmethod
+    def timed(func, samples, sql_time):
+        """Выполняет func и пишет её время и время в SQLite, мс."""
+        spent = []
+
+        def timer(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                spent.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        with connection.execute_wrapper(timer):
+            func()
+        samples.append((time.perf_counter() - started) * 1000)
+        sql_time.append(sum(spent) * 1000)
+
+    def baseline(self, author_ids, repeat=50):
+        """Медианное время в SQLite одной операции без конкуренции, мс."""
+        rnd = random.Random(SEED)
+        result = {}
+        for name in OPERATIONS:
+            samples, sql_time = [], []
+            for _ in range(repeat):
+                self.timed(
+                    lambda: self.operation(name, rnd, author_ids),
+                    samples, sql_time
+                )
+                close_old_connections()
+            result[name] = statistics.median(sql_time)
+        return result
+
+    def load(self, author_ids, options):
+        """Потоки выполняют операции до истечения duration."""
+        results = {name: ([], []) for name in OPERATIONS}
+        errors = []
+        lock = threading.Lock()
+        deadline = time.perf_counter() + options['duration']
+
+        def worker(number):
+            rnd = random.Random(SEED + number)
+            own = {name: ([], []) for name in OPERATIONS}
+            failed = 0
+            while time.perf_counter() < deadline:
+                name = (
+                    'write' if rnd.random() < options['write_share']
+                    else 'read'
+                )
+                try:
+                    self.timed(
+                        lambda: self.operation(name, rnd, author_ids),
+                        *own[name]
+                    )
+                except OperationalError:
+                    failed += 1
+                # Конец «запроса»: без CONN_MAX_AGE соединение закрывается
+                close_old_connections()
+            connection.close()
+            with lock:
+                for name in OPERATIONS:
+                    results[name][0].extend(own[name][0])
+                    results[name][1].extend(own[name][1])
+                errors.append(failed)
+
+        threads = [
+            threading.Thread(target=worker, args=(number,))
+            for number in range(options['threads'])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results, sum(errors)
+
+    def report(self, mode, baseline, load, options):
+        results, errors = load
+        self.stdout.write(self.style.MIGRATE_HEADING(mode))
+        lock_wait = 0
+        for name in OPERATIONS:
+            samples, sql_time = results[name]
+            # Время в SQLite сверх того же запроса без конкуренции:
+            # ожидание блокировок и диска, а при многих потоках и GIL
+            lock_wait += max(
+                sum(sql_time) - len(sql_time) * baseline[name], 0)
+            if not samples:
+                self.stdout.write(f'  {name:<6} нет успешных операций')
+                continue
+            self.stdout.write(
+                f'  {name:<6} {len(samples) / options["duration"]:>8.1f} '
+                f'оп/с  p50 {percentile(samples, 50):>8.2f} мс  '
+                f'p99 {percentile(samples, 99):>8.2f} мс'
+            )
+        busy = options['threads'] * options['duration'] * 1000
+        self.stdout.write(
+            f'  ожидание в SQLite {lock_wait / 1000:.2f} с '
+            f'({lock_wait / busy:.0%} времени потоков), '
+            f'ошибок "database is locked": {errors}'
+        )
@@ -0,0 +1,160 @@
+import json
+import platform
+from importlib import import_module
+
+import django
+from django.contrib.auth import get_user_model
+from django.contrib.auth.tokens import default_token_generator
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from core.benchmark import SEED, benchmark_database, measure, seed, summary
+
+# Модули URL, маршруты которых меряем, и их пространства имён
+URLCONFS = {
+    'posts': 'posts.urls',
+    'users': 'users.urls',
+    'about': 'about.urls',
+}
+# После этих страниц клиент теряет сессию, их открываем анонимно
+ANONYMOUS_ROUTES = ('users:logout',)
+# Полные выгрузки доступны персоналу, их открываем от его имени
+STAFF_ROUTES = ('posts:profile_export', 'posts:group_export')
+STAFF_USERNAME = 'benchmark_staff'
+
+
+class Command(BaseCommand):
+    help = (
+        'Генерирует воспроизводимый набор данных в отдельной БД, меряет '
+        'все маршруты posts, users и about тестовым клиентом и пишет '
+        'p50/p95/p99 и число SQL-запросов в JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=50000)
+        parser.add_argument('--repeat', type=int, default=30)
+        parser.add_argument(
+            '--output', default='benchmark.json',
+            help='Куда записать результаты.'
+        )
+
+    @override_settings(DEBUG=False)
+    def handle(self, *args, **options):
+        # DEBUG выключен, как в бою: иначе каждый запрос пишется в лог
+        with benchmark_database():
+            self.stdout.write('Генерируем данные...')
+            author_ids, group_ids = seed(
+                options['users'], options['groups'], options['posts'])
+            routes = self.routes(author_ids[0], group_ids[0])
+            # Заводим заранее: новый пользователь повышает версии кешей
+            self.staff_user()
+            results = {
+                name: self.run(name, url, options['repeat'])
+                for name, url in routes.items()
+            }
+        report = {
+            'meta': {
+                'users': options['users'],
+                'groups': options['groups'],
+                'posts': options['posts'],
+                'repeat': options['repeat'],
+                'seed': SEED,
+                'django': django.get_version(),
+                'python': platform.python_version(),
+            },
+            'routes': results,
+        }
+        with open(options['output'], 'w', encoding='utf-8') as output:
+            json.dump(report, output, ensure_ascii=False, indent=2,
+                      sort_keys=True)
+            output.write('\n')
+        for name, result in sorted(results.items()):
+            if 'error' in result:
+                self.stdout.write(f'{name:35} ошибка: {result["error"]}')
+                continue
+            self.stdout.write(
+                f'{name:35} {result["status"]} '
+                f'p50 {result["p50"]:8.2f} мс  p95 {result["p95"]:8.2f} мс  '
+                f'p99 {result["p99"]:8.2f} мс  SQL {result["queries"]}'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Результаты записаны в {options["output"]}'))
+
+    @staticmethod
+    def routes(author_id, group_id):
+        """URL каждого маршрута с аргументами из сгенерированных данных."""
+        from posts.models import Group, Post
+
+        user = get_user_model().objects.get(pk=author_id)
+        post = Post.objects.filter(author=user).first()
+        arguments = {
+            'slug': Group.objects.get(pk=group_id).slug,
+            'username': user.username,
+            'post_id': post.pk,
+            'uidb64': urlsafe_base64_encode(force_bytes(user.pk)),
+            'token': default_token_generator.make_token(user),
+        }
+        routes = {}
+        for namespace, module in URLCONFS.items():
+            for pattern in import_module(module).urlpatterns:
+                name = f'{namespace}:{pattern.name}'
+                kwargs = {
+                    key: arguments[key]
+                    for key in pattern.pattern.converters
+                }
+                routes[name] = reverse(name, kwargs=kwargs)
+        return routes
+
+    def run(self, name, url, repeat):
+        client = Client()
+        if name in STAFF_ROUTES:
+            client.force_login(self.staff_user())
+        elif name not in ANONYMOUS_ROUTES:
+            client.force_login(self.benchmark_user())
+        # Первый запрос холодный: по нему считаем SQL без кеша
+        cache.clear()
+        # Тестовый клиент чистит лог запросов в начале каждого запроса,
+        # поэтому перед замером лог должен быть пуст
+        reset_queries()
+        try:
+            with CaptureQueriesContext(connection) as queries:
+                response = fetch(client, url)
+        except Exception as error:
+            # Сломанная страница не должна останавливать весь прогон
+            self.stderr.write(f'{name}: {error!r}')
+            return {'url': url, 'error': repr(error)}
+        # Считаем сразу: следующие запросы клиента очистят лог
+        query_count = len(queries)
+        samples = measure(lambda: fetch(client, url), repeat)
+        return dict(
+            summary(samples),
+            url=url,
+            status=response.status_code,
+            queries=query_count,
+        )
+
+    @staticmethod
+    def benchmark_user():
+        return get_user_model().objects.order_by('pk').first()
+
+    @staticmethod
+    def staff_user():
+        user, _ = get_user_model().objects.get_or_create(
+            username=STAFF_USERNAME, defaults={'is_staff': True})
+        return user
+
+
+def fetch(client, url):
+    """GET с чтением потокового ответа целиком, чтобы учесть его время."""
+    response = client.get(url)
+    if response.streaming:
+        b''.join(response.streaming_content)
+    return response
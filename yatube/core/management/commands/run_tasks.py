@@ -0,0 +1,85 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, close_old_connections
+
+from core import tasks
+
+
+def run_in_thread(task_obj):
+    try:
+        tasks.run(task_obj)
+    finally:
+        # У каждого потока пула своё соединение с БД
+        close_old_connections()
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет фоновые задачи из очереди core.Task в пуле потоков. '
+        'С --stats только показывает глубину очереди и число повторов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help='Потоки пула; 0 - выполнять задачи в текущем потоке.'
+        )
+        parser.add_argument(
+            '--batch', type=int, default=50,
+            help='Сколько задач забирать из очереди за раз.'
+        )
+        parser.add_argument(
+            '--poll', type=float, default=1.0,
+            help='Пауза в секундах, когда очередь пуста.'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить готовые задачи и выйти.'
+        )
+        parser.add_argument('--stats', action='store_true')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.write_stats()
+            return
+        if options['workers']:
+            with ThreadPoolExecutor(
+                max_workers=options['workers'], thread_name_prefix='tasks'
+            ) as executor:
+                self.loop(executor.map, run_in_thread, options)
+        else:
+            self.loop(map, tasks.run, options)
+        self.write_stats()
+
+    @staticmethod
+    def loop(map_func, run, options):
+        while True:
+            try:
+                batch = tasks.claim(options['batch'])
+            except OperationalError:
+                # БД дольше timeout занята записью: ждём и пробуем снова,
+                # а не останавливаем очередь
+                tasks.logger.warning(
+                    'Не удалось забрать задачи', exc_info=True)
+                time.sleep(options['poll'])
+                continue
+            # list() дожидается всей пачки и пробрасывает ошибки пула
+            list(map_func(run, batch))
+            if batch:
+                continue
+            if options['once']:
+                return
+            time.sleep(options['poll'])
+
+    def write_stats(self):
+        stats = tasks.stats()
+        for status in ('pending', 'running', 'failed'):
+            self.stdout.write(
+                f'{status:<8} {stats[status]["count"]:>6} задач, '
+                f'повторов {stats[status]["retries"] or 0}'
+            )
+        age = stats['oldest_pending_age']
+        if age is not None:
+            self.stdout.write(f'старейшая ждёт {age:.1f} с')
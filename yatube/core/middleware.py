@@ -0,0 +1,131 @@
+"""Замер времени запроса: SQL, рендеринг шаблонов и остальной Python.
+
+Итог отдаётся заголовком Server-Timing и, для доли запросов из
+PERF_LOG_SAMPLE_RATE, строкой лога ``core.performance``. Запросы к БД
+считаются через execute_wrapper, шаблоны - шаблонизатором
+core.backends.TimedDjangoTemplates, который без активного замера лишь
+проверяет атрибут потока.
+"""
+import logging
+import random
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+from .queries import QueryDetector, describe
+
+logger = logging.getLogger('core.performance')
+query_logger = logging.getLogger('core.queries')
+_local = threading.local()
+
+
+class RequestTimings:
+    """Счётчики одного запроса, время в секундах."""
+
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.rendering = False
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - started
+            self.sql_count += 1
+
+
+@contextmanager
+def timed_rendering():
+    """Добавляет время блока к рендерингу шаблонов текущего запроса."""
+    timings = getattr(_local, 'timings', None)
+    # Шаблон, отрисованный внутри другого, входит во внешний замер
+    if timings is None or timings.rendering:
+        yield
+        return
+    timings.rendering = True
+    sql_before = timings.sql_time
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        # Ленивые QuerySet выполняются в шаблоне: их время уже в sql
+        timings.template_time += (
+            time.perf_counter() - started - (timings.sql_time - sql_before))
+        timings.rendering = False
+
+
+class PerformanceMiddleware:
+    """Ставить первым в MIDDLEWARE, чтобы total покрывал весь запрос."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = RequestTimings()
+        _local.timings = timings
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(timings))
+                response = self.get_response(request)
+        finally:
+            _local.timings = None
+        total = time.perf_counter() - started
+        metrics = {
+            'sql': timings.sql_time * 1000,
+            'tpl': timings.template_time * 1000,
+            'app': (total - timings.sql_time - timings.template_time) * 1000,
+            'total': total * 1000,
+        }
+        response['Server-Timing'] = ', '.join(
+            [f'sql;dur={metrics["sql"]:.1f};desc="{timings.sql_count} SQL"']
+            + [f'{name};dur={metrics[name]:.1f}'
+               for name in ('tpl', 'app', 'total')]
+        )
+        if random.random() < settings.PERF_LOG_SAMPLE_RATE:
+            self.log(request, response, timings.sql_count, metrics)
+        return response
+
+    @staticmethod
+    def log(request, response, sql_count, metrics):
+        match = request.resolver_match
+        view_name = match.view_name if match else None
+        logger.info(
+            'view=%s status=%s sql_count=%d sql=%.1f tpl=%.1f app=%.1f '
+            'total=%.1f',
+            view_name, response.status_code, sql_count, metrics['sql'],
+            metrics['tpl'], metrics['app'], metrics['total'],
+            extra={
+                'view_name': view_name,
+                'status': response.status_code,
+                'sql_count': sql_count,
+                **metrics,
+            }
+        )
+
+
+class QueryDetectorMiddleware:
+    """В DEBUG пишет в лог повторяющиеся запросы страницы."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.DEBUG:
+            return self.get_response(request)
+        with QueryDetector() as detector:
+            response = self.get_response(request)
+        duplicates = detector.duplicates()
+        if duplicates:
+            query_logger.warning(
+                'Повторяющиеся запросы на %s (порог %d):\n%s',
+                request.path, detector.threshold, describe(duplicates)
+            )
+        return response
@@ -0,0 +1,79 @@
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+
+class Task(models.Model):
+    """Фоновая задача локальной очереди, см. core.tasks."""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'Ждёт'),
+        (RUNNING, 'Выполняется'),
+        (FAILED, 'Ошибка'),
+    )
+
+    name = models.CharField(
+        max_length=200,
+        verbose_name='Функция'
+    )
+    args = models.TextField(
+        default='[]',
+        verbose_name='Аргументы (JSON)'
+    )
+    key = models.CharField(
+        max_length=200,
+        blank=True,
+        verbose_name='Ключ',
+        help_text='Ждущая задача с тем же ключом не дублируется'
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUSES,
+        default=PENDING,
+        verbose_name='Статус'
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Неудачных попыток'
+    )
+    run_after = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Не раньше'
+    )
+    locked_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Взята в работу'
+    )
+    locked_by = models.CharField(
+        max_length=32,
+        blank=True,
+        verbose_name='Обработчик'
+    )
+    error = models.TextField(
+        blank=True,
+        verbose_name='Последняя ошибка'
+    )
+
+    class Meta:
+        verbose_name = 'Задача'
+        verbose_name_plural = 'Задачи'
+        indexes = (
+            models.Index(
+                fields=('status', 'run_after'),
+                name='task_status_run_after_idx'
+            ),
+            models.Index(fields=('locked_by',), name='task_locked_by_idx'),
+        )
+        constraints = (
+            models.UniqueConstraint(
+                fields=('key',),
+                condition=Q(status='pending') & ~Q(key=''),
+                name='unique_pending_task_key'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.name}{self.args}'
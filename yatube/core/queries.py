@@ -0,0 +1,121 @@
+"""Поиск N+1 и повторяющихся SQL-запросов.
+
+Запросы группируются по нормализованному тексту (литералы и списки IN
+заменены заглушками) и месту вызова: узлу шаблона или первой строке
+кода проекта в стеке. Один и тот же запрос, выполненный из одного места
+больше QUERY_DETECTOR_THRESHOLD раз, почти всегда означает запрос в
+цикле по строкам выборки.
+"""
+import os
+import re
+import sys
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.signals import request_finished, request_started
+from django.db import connections
+from django.template.base import Node
+
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE = re.compile(r'\b\d+\b')
+IN_RE = re.compile(r'IN \(\?(?:, \?)*\)')
+# Кадры этих модулей - обёртки execute, а не место запроса
+SKIPPED_FILES = {
+    os.path.join(os.path.dirname(__file__), 'queries.py'),
+    os.path.join(os.path.dirname(__file__), 'middleware.py'),
+}
+
+
+def normalize(sql):
+    sql = STRING_RE.sub('?', sql)
+    sql = NUMBER_RE.sub('?', sql).replace('%s', '?')
+    return IN_RE.sub('IN (...)', sql)
+
+
+def query_origin():
+    """Строка шаблона или кода проекта, откуда выполнен запрос."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        node = frame.f_locals.get('self')
+        # type(), а не isinstance(): isinstance обращается к __class__ и
+        # вычисляет ленивые объекты вроде request.user
+        if issubclass(type(node), Node) and getattr(node, 'token', None):
+            return f'{node.origin.name}:{node.token.lineno}'
+        filename = frame.f_code.co_filename
+        if (filename.startswith(settings.BASE_DIR)
+                and filename not in SKIPPED_FILES):
+            path = os.path.relpath(filename, settings.BASE_DIR)
+            return f'{path}:{frame.f_lineno}'
+        frame = frame.f_back
+    return 'unknown'
+
+
+class QueryDetector:
+    """Контекстный менеджер, считающий запросы по форме и месту вызова."""
+
+    def __init__(self, threshold=None):
+        if threshold is None:
+            threshold = settings.QUERY_DETECTOR_THRESHOLD
+        self.threshold = threshold
+        self.queries = Counter()
+        self._stack = None
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries[normalize(sql), query_origin()] += 1
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+        self._stack = None
+
+    def duplicates(self):
+        """Список (число, запрос, место) сверх порога, частые первыми."""
+        return [
+            (count, sql, origin)
+            for (sql, origin), count in self.queries.most_common()
+            if count > self.threshold
+        ]
+
+
+def describe(duplicates):
+    return '\n'.join(
+        f'{count} x {origin}: {sql}' for count, sql, origin in duplicates)
+
+
+class QueryDetectorMixin:
+    """Примесь к TestCase: каждый запрос тестового клиента проверяется
+    детектором, повторы сверх порога проваливают тест."""
+
+    # _pre_setup, а не setUp: тестам не нужно вызывать super().setUp()
+    def _pre_setup(self):
+        super()._pre_setup()
+        self._detector = None
+        request_started.connect(self._start_detector)
+        request_finished.connect(self._check_detector)
+
+    def _post_teardown(self):
+        request_started.disconnect(self._start_detector)
+        request_finished.disconnect(self._check_detector)
+        super()._post_teardown()
+
+    def _start_detector(self, **kwargs):
+        self._detector = QueryDetector().__enter__()
+
+    def _check_detector(self, **kwargs):
+        detector, self._detector = self._detector, None
+        if detector is None:
+            return
+        detector.__exit__(None, None, None)
+        duplicates = detector.duplicates()
+        if duplicates:
+            self.fail(
+                f'Повторяющиеся запросы (порог {detector.threshold}):\n'
+                f'{describe(duplicates)}'
+            )
@@ -0,0 +1,126 @@
+"""Чтение лент с реплик БД.
+
+Представления, отмеченные replica_reads, читают модели приложений из
+DATABASE_REPLICA_APPS с одной из реплик DATABASE_REPLICAS; всё
+остальное, включая сессии и пользователей, и любая запись идут в
+основную БД. Запрос, который что-то записал, закрепляет сессию за
+основной БД на REPLICA_STICKY_SECONDS: реплика может отставать, а
+пользователь должен сразу видеть свой пост.
+
+Каждая копия реплик, сделанная sync_replicas, получает новое поколение.
+Кеши и ETag, построенные по прочитанному с реплики, включают его: данные
+реплики могут отставать от версии ленты и не должны попасть под ключ,
+который читают запросы к основной БД.
+"""
+import contextvars
+import random
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+
+STICKY_SESSION_KEY = 'db_primary_until'
+GENERATION_KEY = 'replica_generation'
+_state = contextvars.ContextVar('db_routing', default=None)
+
+
+class RoutingState:
+    """Маршрутизация одного запроса."""
+
+    def __init__(self):
+        self.replica = None
+        self.wrote = False
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if (
+            state is not None and state.replica is not None
+            and not state.wrote
+            and model._meta.app_label in settings.DATABASE_REPLICA_APPS
+        ):
+            return state.replica
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        # Явно, иначе объект, прочитанный с реплики, сохранился бы туда же
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # На репликах те же данные, что в основной БД
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Реплики получают схему вместе с копией основной БД
+        return db not in settings.DATABASE_REPLICAS
+
+
+def generation_cache():
+    return caches[settings.REPLICA_GENERATION_CACHE_ALIAS]
+
+
+def replica_generation():
+    """Поколение копии реплик, с которой читает текущий запрос; None,
+    если он читает из основной БД."""
+    state = _state.get()
+    if state is None or state.replica is None or state.wrote:
+        return None
+    cache = generation_cache()
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        cache.add(GENERATION_KEY, int(time.time() * 1000), None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def bump_replica_generation():
+    cache = generation_cache()
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, int(time.time() * 1000), None)
+
+
+def is_sticky(request):
+    return request.session.get(STICKY_SESSION_KEY, 0) > time.time()
+
+
+def replica_reads(view):
+    """Разрешает представлению читать ленты с реплики."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        state = _state.get()
+        if (
+            state is not None and settings.DATABASE_REPLICAS
+            and not is_sticky(request)
+        ):
+            # Одна реплика на весь запрос: страница согласована сама с собой
+            state.replica = random.choice(settings.DATABASE_REPLICAS)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+class ReplicaRoutingMiddleware:
+    """Заводит состояние маршрутизации запроса и закрепляет сессию за
+    основной БД после записи."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = RoutingState()
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        if state.wrote and settings.DATABASE_REPLICAS:
+            request.session[STICKY_SESSION_KEY] = (
+                time.time() + settings.REPLICA_STICKY_SECONDS)
+        return response
@@ -0,0 +1,140 @@
+"""Локальная очередь фоновых задач в таблице БД.
+
+Запрос только вставляет строку Task - одна запись вне зависимости от
+того, сколько работы за ней стоит, - когда его транзакция
+зафиксирована. Команда run_tasks забирает задачи пачками и выполняет
+их в пуле потоков. Упавшая задача повторяется с растущей паузой до
+TASK_MAX_ATTEMPTS раз, затем остаётся в статусе failed для разбора.
+
+Задачи должны быть идемпотентными: обработчик, не успевший отчитаться
+за TASK_LOCK_TIMEOUT секунд, считается упавшим, и его задача выполнится
+ещё раз. При TASKS_EAGER задачи выполняются сразу, без очереди.
+"""
+import datetime as dt
+import json
+import logging
+import traceback
+import uuid
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Min, Q, Sum
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Task
+
+logger = logging.getLogger('core.tasks')
+
+
+def task(func):
+    """Разрешает ставить функцию в очередь; аргументы - JSON."""
+    func.task_name = f'{func.__module__}.{func.__qualname__}'
+    return func
+
+
+def enqueue(func, *args, key=''):
+    """Ставит func(*args) в очередь после фиксации текущей транзакции.
+
+    Задача видит только зафиксированные данные, а после отката
+    транзакции не ставится вовсе. Если задача с тем же непустым key ещё
+    ждёт выполнения, новая не добавляется: обе сделали бы одно и то же.
+    """
+    transaction.on_commit(lambda: _enqueue(func, args, key))
+
+
+def _enqueue(func, args, key):
+    if settings.TASKS_EAGER:
+        func(*args)
+        return
+    Task.objects.bulk_create(
+        [Task(name=func.task_name, args=json.dumps(args), key=key)],
+        ignore_conflicts=True
+    )
+
+
+def resolve(name):
+    func = import_string(name)
+    if getattr(func, 'task_name', None) != name:
+        raise LookupError(f'{name} не зарегистрирована как задача')
+    return func
+
+
+def claim(limit):
+    """Забирает до limit готовых задач, в том числе брошенные упавшими
+    обработчиками."""
+    now = timezone.now()
+    token = uuid.uuid4().hex
+    stale = now - dt.timedelta(seconds=settings.TASK_LOCK_TIMEOUT)
+    ready = Task.objects.filter(
+        Q(status=Task.PENDING, run_after__lte=now)
+        | Q(status=Task.RUNNING, locked_at__lt=stale)
+    )
+    # Одна инструкция UPDATE ... WHERE id IN (SELECT ... LIMIT): SQLite
+    # сразу берёт блокировку записи и ждёт её по timeout. SELECT и UPDATE
+    # в одной транзакции падали бы с database is locked, если между ними
+    # другое соединение поставило задачу. Условие ready во внешнем
+    # UPDATE не даёт двум обработчикам взять одну задачу.
+    ready.filter(
+        pk__in=ready.order_by('run_after', 'pk').values('pk')[:limit]
+    ).update(status=Task.RUNNING, locked_at=now, locked_by=token)
+    return list(Task.objects.filter(locked_by=token).order_by('pk'))
+
+
+def run(task_obj):
+    """Выполняет забранную задачу и отмечает результат."""
+    try:
+        resolve(task_obj.name)(*json.loads(task_obj.args))
+    except Exception:
+        logger.exception('Задача %s упала', task_obj)
+        fail(task_obj, traceback.format_exc())
+    else:
+        Task.objects.filter(
+            pk=task_obj.pk, locked_by=task_obj.locked_by).delete()
+
+
+def fail(task_obj, error):
+    attempts = task_obj.attempts + 1
+    mine = Task.objects.filter(pk=task_obj.pk, locked_by=task_obj.locked_by)
+    if attempts >= settings.TASK_MAX_ATTEMPTS:
+        mine.update(status=Task.FAILED, attempts=attempts, error=error,
+                    locked_by='')
+        return
+    delay = settings.TASK_RETRY_DELAY * 2 ** (attempts - 1)
+    try:
+        with transaction.atomic():
+            mine.update(
+                status=Task.PENDING, attempts=attempts, error=error,
+                locked_by='', locked_at=None,
+                run_after=timezone.now() + dt.timedelta(seconds=delay)
+            )
+    except IntegrityError:
+        # Такая же задача уже ждёт в очереди - она и выполнит работу
+        mine.delete()
+
+
+def run_pending(limit=100):
+    """Выполняет готовые задачи в текущем потоке; число выполненных."""
+    tasks = claim(limit)
+    for task_obj in tasks:
+        run(task_obj)
+    return len(tasks)
+
+
+def stats():
+    """Глубина очереди по статусам, число повторов и возраст старейшей
+    ждущей задачи в секундах."""
+    rows = Task.objects.values('status').annotate(
+        count=Count('pk'), retries=Sum('attempts'), oldest=Min('run_after')
+    ).order_by()
+    result = {
+        status: {'count': 0, 'retries': 0} for status, _ in Task.STATUSES
+    }
+    result['oldest_pending_age'] = None
+    for row in rows:
+        result[row['status']] = {
+            'count': row['count'], 'retries': row['retries']}
+        if row['status'] == Task.PENDING:
+            age = (timezone.now() - row['oldest']).total_seconds()
+            result['oldest_pending_age'] = max(age, 0)
+    return result
@@ -0,0 +1,33 @@
+"""Помощники тестов, которых нет в Django 2.2."""
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class OnCommitMixin:
+    """Примесь к TestCase: captureOnCommitCallbacks из Django 3.2.
+
+    TestCase держит тест в откатываемой транзакции, поэтому колбэки
+    transaction.on_commit, например постановка фоновых задач, сами не
+    выполняются. С execute=True они выполняются на выходе из блока,
+    вместе с колбэками, которые добавили они сами.
+    """
+
+    @classmethod
+    @contextmanager
+    def captureOnCommitCallbacks(cls, *, using=DEFAULT_DB_ALIAS,
+                                 execute=False):
+        callbacks = []
+        run_on_commit = connections[using].run_on_commit
+        start = len(run_on_commit)
+        try:
+            yield callbacks
+        finally:
+            while True:
+                added = [func for _, func in run_on_commit[start:]]
+                start = len(run_on_commit)
+                callbacks.extend(added)
+                if not execute or not added:
+                    break
+                for func in added:
+                    func()
@@ -0,0 +1,25 @@
+import tempfile
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from core.cache import VersionFileCache
+
+
+class VersionFileCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache = VersionFileCache(directory.name, {'TIMEOUT': None})
+
+    def test_write_does_not_list_directory(self):
+        """Запись и повышение счётчика не перечисляют каталог кеша"""
+        for number in range(5):
+            self.cache.set(f'version:{number}', number)
+        with mock.patch.object(
+            self.cache, '_list_cache_files',
+            side_effect=AssertionError('каталог перечислен')
+        ):
+            self.cache.add('version:new', 1)
+            self.assertEqual(self.cache.incr('version:0'), 1)
+        self.assertEqual(self.cache.get('version:new'), 1)
@@ -0,0 +1,64 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.template.base import Template
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core import middleware
+from posts.models import Post, User
+
+
+class PerformanceMiddlewareTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='TestAuthor')
+        Post.objects.create(author=cls.author, text='Тестовый текст')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    @staticmethod
+    def parse(header):
+        metrics = {}
+        for item in header.split(', '):
+            name, duration, *rest = item.split(';')
+            metrics[name] = (float(duration[len('dur='):]), rest)
+        return metrics
+
+    @override_settings(PERF_LOG_SAMPLE_RATE=0)
+    def test_server_timing_header(self):
+        """Ответ содержит Server-Timing с SQL, шаблонами и общим временем"""
+        response = self.client.get(reverse('posts:index'))
+        metrics = self.parse(response['Server-Timing'])
+        self.assertEqual(set(metrics), {'sql', 'tpl', 'app', 'total'})
+        sql, desc = metrics['sql']
+        self.assertNotEqual(desc, ['desc="0 SQL"'])
+        self.assertGreater(metrics['tpl'][0], 0)
+        self.assertLessEqual(
+            sql + metrics['tpl'][0], metrics['total'][0] + 0.2)
+
+    @override_settings(PERF_LOG_SAMPLE_RATE=1)
+    def test_sampled_log_has_view_name(self):
+        """Выбранный запрос пишется в лог с именем представления"""
+        with self.assertLogs('core.performance', 'INFO') as logs:
+            self.client.get(reverse('posts:index'))
+        self.assertEqual(len(logs.records), 1)
+        record = logs.records[0]
+        self.assertEqual(record.view_name, 'posts:index')
+        self.assertGreater(record.sql_count, 0)
+
+    @override_settings(PERF_LOG_SAMPLE_RATE=0)
+    def test_not_sampled_request_is_not_logged(self):
+        """При нулевой доле лог не пишется"""
+        with mock.patch.object(middleware.logger, 'info') as info:
+            self.client.get(reverse('posts:index'))
+        info.assert_not_called()
+
+    def test_template_class_is_not_patched(self):
+        """Замер не подменяет Template.render во всём процессе"""
+        render = Template.render
+        middleware.PerformanceMiddleware(lambda request: None)
+        self.assertIs(Template.render, render)
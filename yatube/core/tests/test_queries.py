@@ -0,0 +1,53 @@
+from django.template import Context, Template
+from django.test import TestCase
+
+from core.queries import QueryDetector, normalize
+from posts.models import Group, Post, User
+
+POSTS = 5
+
+
+class QueryDetectorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = User.objects.create(username='TestAuthor')
+        for i in range(POSTS):
+            group = Group.objects.create(
+                title=f'Группа {i}', slug=f'group_{i}', description='')
+            Post.objects.create(author=author, text='Текст', group=group)
+
+    def test_normalize(self):
+        """Литералы и списки IN не различают форму запроса"""
+        self.assertEqual(
+            normalize("SELECT * FROM t WHERE id IN (%s, %s) AND a = 'x'"),
+            normalize('SELECT * FROM t WHERE id IN (%s) AND a = 7'),
+        )
+
+    def test_loop_in_code(self):
+        """Запрос в цикле по выборке находится по строке кода"""
+        with QueryDetector(threshold=3) as detector:
+            for post in Post.objects.all():
+                post.group.title
+        (count, sql, origin), = detector.duplicates()
+        self.assertEqual(count, POSTS)
+        self.assertIn('posts_group', sql)
+        self.assertTrue(origin.startswith('core/tests/test_queries.py:'))
+
+    def test_loop_in_template(self):
+        """Запрос в цикле шаблона находится по строке шаблона"""
+        template = Template(
+            '{% for post in posts %}\n{{ post.group.title }}{% endfor %}')
+        posts = Post.objects.all()
+        with QueryDetector(threshold=3) as detector:
+            template.render(Context({'posts': posts}))
+        (count, sql, origin), = detector.duplicates()
+        self.assertEqual(count, POSTS)
+        self.assertTrue(origin.endswith(':2'))
+
+    def test_select_related_is_clean(self):
+        """С select_related повторов нет"""
+        with QueryDetector(threshold=3) as detector:
+            for post in Post.objects.select_related('group'):
+                post.group.title
+        self.assertEqual(detector.duplicates(), [])
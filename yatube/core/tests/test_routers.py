@@ -0,0 +1,85 @@
+import time
+
+from django.db import router
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from core.routers import (STICKY_SESSION_KEY, ReplicaRoutingMiddleware,
+                          bump_replica_generation, replica_reads)
+from posts.cache import INDEX_FEED, get_feed_version, read_version
+from posts.models import Post, User
+
+REPLICA = 'replica_test'
+
+
+@replica_reads
+def reading_view(request):
+    return HttpResponse(','.join((
+        router.db_for_read(Post),
+        router.db_for_read(User),
+    )))
+
+
+@replica_reads
+def writing_view(request):
+    router.db_for_write(Post)
+    return HttpResponse(router.db_for_read(Post))
+
+
+def plain_view(request):
+    return HttpResponse(router.db_for_read(Post))
+
+
+def version_view(request):
+    return HttpResponse(str(read_version(INDEX_FEED)))
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA])
+class ReplicaRouterTests(TestCase):
+    def get(self, view, session=None):
+        request = RequestFactory().get('/')
+        request.session = session if session is not None else {}
+        response = ReplicaRoutingMiddleware(view)(request)
+        return response.content.decode(), request.session
+
+    def test_marked_view_reads_feeds_from_replica(self):
+        """Отмеченное представление читает посты с реплики, а
+        пользователей - из основной БД"""
+        self.assertEqual(
+            self.get(reading_view)[0], f'{REPLICA},default')
+        self.assertEqual(self.get(plain_view)[0], 'default')
+        self.assertEqual(router.db_for_read(Post), 'default')
+
+    def test_write_pins_session_to_primary(self):
+        """После записи запрос и сессия читают из основной БД"""
+        content, session = self.get(writing_view)
+        self.assertEqual(content, 'default')
+        self.assertGreater(session[STICKY_SESSION_KEY], time.time())
+        self.assertEqual(self.get(reading_view, session)[0],
+                         'default,default')
+        session[STICKY_SESSION_KEY] = time.time() - 1
+        self.assertEqual(self.get(reading_view, session)[0],
+                         f'{REPLICA},default')
+
+    def test_post_create_pins_session(self):
+        """Создание поста закрепляет сессию за основной БД"""
+        user = User.objects.create(username='author')
+        client = Client()
+        client.force_login(user)
+        client.post(reverse('posts:post_create'), {'text': 'Текст'})
+        self.assertIn(STICKY_SESSION_KEY, client.session)
+
+    def test_replica_reads_are_versioned_by_generation(self):
+        """Прочитанное с реплики кешируется под поколением её копии,
+        а не под ключом основной БД"""
+        version = str(get_feed_version(INDEX_FEED))
+        self.assertEqual(self.get(version_view)[0], version)
+        replica_version = self.get(replica_reads(version_view))[0]
+        self.assertNotEqual(replica_version, version)
+        self.assertTrue(replica_version.startswith(version))
+        self.assertEqual(
+            self.get(replica_reads(version_view))[0], replica_version)
+        bump_replica_generation()
+        self.assertNotEqual(
+            self.get(replica_reads(version_view))[0], replica_version)
@@ -0,0 +1,204 @@
+import datetime as dt
+import os
+import tempfile
+import threading
+import time
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import OperationalError, connections
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from core import tasks
+from core.models import Task
+from core.testing import OnCommitMixin
+from posts import search
+from posts.models import Follow, Post, TimelineEntry, User
+
+calls = []
+
+
+@tasks.task
+def remember(value):
+    calls.append(value)
+
+
+@tasks.task
+def broken():
+    raise RuntimeError('сломалась')
+
+
+def not_a_task():
+    pass
+
+
+@override_settings(TASKS_EAGER=False, TASK_MAX_ATTEMPTS=2,
+                   TASK_RETRY_DELAY=10)
+class TaskQueueTests(OnCommitMixin, TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_pending_task_with_same_key_is_not_duplicated(self):
+        """Ждущая задача с тем же ключом не дублируется"""
+        with self.captureOnCommitCallbacks(execute=True):
+            tasks.enqueue(remember, 1, key='same')
+            tasks.enqueue(remember, 1, key='same')
+            tasks.enqueue(remember, 2)
+            tasks.enqueue(remember, 2)
+        self.assertEqual(Task.objects.count(), 3)
+        self.assertEqual(tasks.run_pending(), 3)
+        self.assertEqual(sorted(calls), [1, 2, 2])
+        self.assertFalse(Task.objects.exists())
+
+    def test_failed_task_is_retried_then_kept(self):
+        """Упавшая задача повторяется с паузой, затем остаётся failed"""
+        with self.captureOnCommitCallbacks(execute=True):
+            tasks.enqueue(broken)
+        with self.assertLogs('core.tasks', 'ERROR'):
+            tasks.run_pending()
+        task = Task.objects.get()
+        self.assertEqual(
+            (task.status, task.attempts), (Task.PENDING, 1))
+        self.assertGreater(task.run_after, timezone.now())
+        self.assertIn('сломалась', task.error)
+        self.assertEqual(tasks.run_pending(), 0)
+        Task.objects.update(run_after=timezone.now())
+        with self.assertLogs('core.tasks', 'ERROR'):
+            tasks.run_pending()
+        task = Task.objects.get()
+        self.assertEqual((task.status, task.attempts), (Task.FAILED, 2))
+        stats = tasks.stats()
+        self.assertEqual(stats['failed'], {'count': 1, 'retries': 2})
+        self.assertEqual(stats['pending']['count'], 0)
+
+    def test_task_waits_for_commit(self):
+        """Задача ставится только после фиксации транзакции"""
+        with self.captureOnCommitCallbacks() as callbacks:
+            tasks.enqueue(remember, 1)
+            self.assertFalse(Task.objects.exists())
+        self.assertEqual(len(callbacks), 1)
+        callbacks[0]()
+        self.assertEqual(Task.objects.count(), 1)
+
+    def test_only_registered_functions_run(self):
+        """Функция без @task из очереди не вызывается"""
+        Task.objects.create(name=f'{__name__}.not_a_task', args='[]')
+        with self.assertLogs('core.tasks', 'ERROR'):
+            tasks.run_pending()
+        self.assertIn('LookupError', Task.objects.get().error)
+
+    def test_abandoned_task_is_reclaimed(self):
+        """Задачу упавшего обработчика забирает другой"""
+        Task.objects.create(
+            name=remember.task_name, args='[7]', status=Task.RUNNING,
+            locked_by='dead',
+            locked_at=timezone.now() - dt.timedelta(hours=1)
+        )
+        tasks.run_pending()
+        self.assertEqual(calls, [7])
+
+    def test_loop_survives_locked_database(self):
+        """Занятая БД не останавливает обработчик: он ждёт и повторяет"""
+        claim = mock.Mock(side_effect=[
+            OperationalError('database is locked'), []])
+        with mock.patch.object(tasks, 'claim', claim), \
+                self.assertLogs('core.tasks', 'WARNING'):
+            call_command('run_tasks', once=True, workers=0, poll=0,
+                         stdout=StringIO())
+        self.assertEqual(claim.call_count, 2)
+
+    def test_post_side_effects_are_queued(self):
+        """Раскладка и индекс поиска нового поста ждут обработчика"""
+        author = User.objects.create(username='author')
+        reader = User.objects.create(username='reader')
+        with override_settings(TASKS_EAGER=True), \
+                self.captureOnCommitCallbacks(execute=True):
+            Follow.objects.create(user=reader, author=author)
+        with self.captureOnCommitCallbacks(execute=True):
+            post = Post.objects.create(author=author, text='очередь')
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(tasks.stats()['pending']['count'], 2)
+        out = StringIO()
+        call_command('run_tasks', once=True, workers=0, stdout=out)
+        self.assertIn('pending       0', out.getvalue())
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=reader, post=post).exists())
+        if search.is_available():
+            self.assertEqual(
+                list(search.SearchResults('очередь')[:1]), [post])
+
+
+FILE_DB = 'tasks_file'
+
+
+class FileDatabaseRouter:
+    """Очередь задач - в отдельной файловой БД теста."""
+
+    def db_for_read(self, model, **hints):
+        return FILE_DB if model._meta.app_label == 'core' else None
+
+    db_for_write = db_for_read
+
+
+@override_settings(
+    DATABASE_ROUTERS=[f'{__name__}.FileDatabaseRouter',
+                      'core.routers.ReplicaRouter'])
+class ClaimConcurrencyTests(SimpleTestCase):
+    """Забор задач под записью из других соединений.
+
+    Тестовая БД в памяти блокирует таблицы иначе, чем файл SQLite,
+    поэтому очередь здесь лежит в настоящем файле.
+    """
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(os.rmdir, directory)
+        name = os.path.join(directory, 'tasks.sqlite3')
+        self.addCleanup(os.remove, name)
+        connections.databases[FILE_DB] = {
+            **connections.databases['default'],
+            'NAME': name, 'TEST': {'NAME': name},
+        }
+        self.addCleanup(connections.databases.pop, FILE_DB)
+        connection = connections[FILE_DB]
+        self.addCleanup(connection.close)
+        with connection.schema_editor() as editor:
+            editor.create_model(Task)
+
+    def in_thread(self, target, errors):
+        def work():
+            try:
+                target()
+            except OperationalError as error:
+                errors.append(error)
+            finally:
+                connections[FILE_DB].close()
+        thread = threading.Thread(target=work)
+        thread.start()
+        return thread
+
+    def test_claim_does_not_fail_under_concurrent_writes(self):
+        """Пока другие соединения ставят задачи, claim не падает с
+        database is locked и не отдаёт задачу дважды"""
+        deadline = time.monotonic() + 2
+        errors, claimed = [], []
+
+        def insert():
+            while time.monotonic() < deadline:
+                Task.objects.create(name=remember.task_name)
+
+        def take():
+            while time.monotonic() < deadline:
+                claimed.extend(task.pk for task in tasks.claim(50))
+
+        threads = [self.in_thread(insert, errors) for _ in range(2)]
+        threads.append(self.in_thread(take, errors))
+        for thread in threads:
+            thread.join()
+        claimed.extend(task.pk for task in tasks.claim(10 ** 6))
+        self.assertEqual(errors, [])
+        self.assertEqual(len(claimed), len(set(claimed)))
+        self.assertEqual(len(claimed), Task.objects.count())
+        self.assertGreater(len(claimed), 0)
@@ -0,0 +1,16 @@
+from contextlib import contextmanager
+
+
+@contextmanager
+def auto_now_add_disabled(model, field_name):
+    """Временно отключает auto_now_add, чтобы сохранить переданную дату.
+
+    Нужно для массовой загрузки исторических данных: bulk_create иначе
+    перезапишет дату публикации текущим временем.
+    """
+    field = model._meta.get_field(field_name)
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
@@ -1,7 +1,9 @@
 from django.contrib import admin
 from django.conf import settings
 
-from .models import Group, Post
+from . import search
+from .models import ArchivedPost, Group, Post
+from .paginators import CachedCountPaginator
 
 
 @admin.register(Post)
@@ -18,6 +20,16 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
     settings.EMPTY_VALUE_DISPLAY
+    # Число записей из кеша; общий COUNT(*) без фильтров не нужен
+    paginator = CachedCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по тексту идёт через индекс FTS5 вместо LIKE '%...%'
+        if not search_term:
+            return super().get_search_results(
+                request, queryset, search_term)
+        return search.filter_queryset(queryset, search_term), False
 
 
 @admin.register(Group)
@@ -27,3 +39,17 @@ class GroupAdmin(admin.ModelAdmin):
         'slug',
         'description',
     )
+
+
+@admin.register(ArchivedPost)
+class ArchivedPostAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk',
+        'text',
+        'pub_date',
+        'author',
+        'group'
+    )
+    list_filter = ('pub_date',)
+    list_select_related = ('author', 'group')
+    empty_value_display = settings.EMPTY_VALUE_DISPLAY
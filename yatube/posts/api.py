@@ -0,0 +1,144 @@
+"""JSON API только для чтения: ленты и страница поста.
+
+Ответы собираются из values() без моделей и шаблонов, а параметр
+fields= оставляет в выборке только нужные клиенту колонки - например,
+лента без полного текста постов. Ленты листаются курсором, как и
+HTML-страницы с параметром cursor. ETag тот же, что у HTML-страниц.
+"""
+from django.core.files.storage import default_storage
+from django.http import JsonResponse
+from django.views.decorators.http import condition, require_GET
+
+from core.routers import replica_reads
+
+from .authors import get_author
+from .groups import registry
+from .models import ArchivedPost, Post
+from .paginators import CursorPaginator, MergedCursorPaginator
+from .views import group_etag, index_etag, post_etag, profile_etag
+
+POSTS_ON_PAGE: int = 20
+# Поле ответа: колонка values()
+FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'author': 'author__username',
+    # slug группы берём из снимка групп, без JOIN
+    'group': 'group_id',
+    'image': 'image',
+    'pub_date': 'pub_date',
+}
+# Колонки ключа курсора выбираются всегда
+CURSOR_COLUMNS = ('id', 'pub_date')
+
+
+def error(message, status):
+    return JsonResponse({'detail': message}, status=status)
+
+
+def parse_fields(request):
+    """Запрошенные поля по порядку FIELDS; неизвестное поле -
+    ValueError."""
+    value = request.GET.get('fields')
+    if not value:
+        return tuple(FIELDS)
+    requested = set(value.split(','))
+    unknown = requested - set(FIELDS)
+    if unknown:
+        raise ValueError(', '.join(sorted(unknown)))
+    return tuple(field for field in FIELDS if field in requested)
+
+
+def columns(fields):
+    return {FIELDS[field] for field in fields} | set(CURSOR_COLUMNS)
+
+
+def group_map(fields):
+    return registry.by_id() if 'group' in fields else {}
+
+
+def serialize(row, fields, groups):
+    data = {}
+    for field in fields:
+        value = row[FIELDS[field]]
+        if field == 'group':
+            group = groups.get(value)
+            value = group.slug if group is not None else None
+        elif field == 'image':
+            value = default_storage.url(value) if value else None
+        elif field == 'pub_date':
+            value = value.isoformat()
+        data[field] = value
+    return data
+
+
+def feed_response(request, *querysets):
+    try:
+        fields = parse_fields(request)
+    except ValueError as unknown:
+        return error(f'Неизвестные поля: {unknown}', 400)
+    sources = [queryset.values(*columns(fields)) for queryset in querysets]
+    if len(sources) > 1:
+        paginator = MergedCursorPaginator(sources, POSTS_ON_PAGE)
+    else:
+        paginator = CursorPaginator(sources[0], POSTS_ON_PAGE)
+    page = paginator.get_page(request.GET.get('cursor'))
+    groups = group_map(fields)
+    return JsonResponse({
+        'results': [serialize(row, fields, groups) for row in page],
+        'next_cursor': page.next_cursor,
+        'previous_cursor': page.previous_cursor,
+    }, json_dumps_params={'ensure_ascii': False})
+
+
+@require_GET
+@replica_reads
+@condition(etag_func=index_etag)
+def index(request):
+    return feed_response(request, Post.objects.all())
+
+
+@require_GET
+@replica_reads
+@condition(etag_func=group_etag)
+def group_posts(request, slug):
+    group = registry.get_by_slug(slug)
+    if group is None:
+        return error('Группа не найдена', 404)
+    return feed_response(request, Post.objects.filter(group_id=group.pk))
+
+
+@require_GET
+@replica_reads
+@condition(etag_func=profile_etag)
+def profile(request, username):
+    author = get_author(username)
+    if author is None:
+        return error('Пользователь не найден', 404)
+    # Колонки архива называются так же, как у постов
+    return feed_response(
+        request,
+        Post.objects.filter(author_id=author.pk),
+        ArchivedPost.objects.filter(author_id=author.pk)
+    )
+
+
+@require_GET
+@replica_reads
+@condition(etag_func=post_etag)
+def post_detail(request, post_id):
+    try:
+        fields = parse_fields(request)
+    except ValueError as unknown:
+        return error(f'Неизвестные поля: {unknown}', 400)
+    row = Post.objects.filter(pk=post_id).values(*columns(fields)).first()
+    if row is None:
+        # Колонки архива называются так же, как у постов
+        row = ArchivedPost.objects.filter(pk=post_id).values(
+            *columns(fields)).first()
+    if row is None:
+        return error('Пост не найден', 404)
+    return JsonResponse(
+        serialize(row, fields, group_map(fields)),
+        json_dumps_params={'ensure_ascii': False}
+    )
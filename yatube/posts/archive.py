@@ -0,0 +1,158 @@
+"""Архив старых постов.
+
+Команда archive_posts пачками переносит посты старше
+ARCHIVE_AFTER_DAYS дней из таблицы постов в ArchivedPost. Ленты,
+индексы и поиск работают только с горячей таблицей, а страница поста и
+номерные страницы профиля продолжаются в архиве.
+"""
+import heapq
+
+from django.db import connection, models, transaction
+
+from . import search
+from .cache import INDEX_FEED, author_feed, bump_feed_versions, group_feed
+from .groups import registry
+from .models import ArchivedPost, Post, TimelineEntry
+
+COLUMNS = (
+    'id', 'text', 'pub_date', 'updated_at', 'author_id', 'group_id', 'image'
+)
+
+
+def archive_batch(cutoff, batch_size):
+    """Переносит до batch_size самых старых постов раньше cutoff;
+    возвращает их число."""
+    with transaction.atomic():
+        rows = list(
+            Post.objects.filter(pub_date__lt=cutoff)
+            .order_by('pub_date', 'pk').values(*COLUMNS)[:batch_size]
+        )
+        if not rows:
+            return 0
+        ids = [row['id'] for row in rows]
+        # ignore_conflicts - повторный запуск после сбоя не упадёт
+        ArchivedPost.objects.bulk_create(
+            (ArchivedPost(**row) for row in rows), ignore_conflicts=True)
+        TimelineEntry.objects.filter(post_id__in=ids).delete()
+        # Мимо сигналов удаления: пост не удалён, счётчик автора и
+        # миниатюры остаются прежними
+        placeholders = ', '.join(['%s'] * len(ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {Post._meta.db_table} '
+                f'WHERE id IN ({placeholders})',
+                ids
+            )
+        if search.is_available():
+            search.unindex_posts(ids)
+    feeds = {INDEX_FEED}
+    for row in rows:
+        feeds.add(author_feed(row['author_id']))
+        if row['group_id']:
+            feeds.add(group_feed(row['group_id']))
+    bump_feed_versions(feeds)
+    return len(rows)
+
+
+def to_posts(archived_posts):
+    """Архивные посты как Post с группами из снимка групп."""
+    groups = registry.by_id()
+    field = Post._meta.get_field('group')
+    posts = []
+    for archived in archived_posts:
+        post = archived.as_post()
+        group = groups.get(post.group_id)
+        if group is not None:
+            field.set_cached_value(post, group)
+        posts.append(post)
+    return posts
+
+
+class ArchivedAsPostsIterable(models.query.ModelIterable):
+    """Строки архива как Post, см. to_posts."""
+
+    def __iter__(self):
+        yield from to_posts(super().__iter__())
+
+
+def get_post(post_id):
+    """Пост из таблицы постов или из архива; None, если его нет."""
+    post = Post.objects.for_feed().select_related('author__stats').filter(
+        pk=post_id).first()
+    if post is None:
+        archived = ArchivedPost.objects.select_related(
+            'author__stats').filter(pk=post_id).first()
+        if archived is not None:
+            post, = to_posts([archived])
+    return post
+
+
+class AuthorFeed:
+    """Посты автора для Paginator: горячая таблица вместе с архивом.
+
+    Архив не обязательно старше таблицы: import_posts добавляет посты с
+    давними датами. Поэтому, как FollowFeed, страница сливает ключи
+    (pub_date, id) обоих источников по индексам (author, -pub_date) и
+    затем читает посты страницы по списку id. Автору без архива
+    страница стоит одного запроса к архиву и одного к таблице.
+
+    Номерная страница читает ключи всех предыдущих страниц, поэтому
+    память на неё растёт со смещением; дальние страницы листаются
+    курсором по sources().
+    """
+
+    def __init__(self, author):
+        self.author = author
+
+    def live(self):
+        return Post.objects.filter(author_id=self.author.pk).for_feed()
+
+    def archived(self):
+        return ArchivedPost.objects.filter(
+            author_id=self.author.pk).select_related('author')
+
+    def sources(self):
+        """Таблица и архив для MergedCursorPaginator; оба отдают Post."""
+        archived = self.archived()
+        archived._iterable_class = ArchivedAsPostsIterable
+        return [self.live(), archived]
+
+    def count(self):
+        # Один запрос на обе таблицы: id в них не пересекаются
+        live = self.live().values('pk').order_by()
+        archived = self.archived().values('pk').order_by()
+        return live.union(archived, all=True).count()
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        stop = index.stop
+        ordering = ('-pub_date', '-pk')
+        # Третий элемент ключа - из горячей ли таблицы пост
+        archived = [
+            (pub_date, pk, False) for pub_date, pk in
+            self.archived().order_by(*ordering)
+            .values_list('pub_date', 'pk')[:stop]
+        ]
+        if not archived:
+            # Архива у автора нет - страница одним запросом, как раньше
+            return list(self.live().order_by(*ordering)[index])
+        live = [
+            (pub_date, pk, True) for pub_date, pk in
+            self.live().order_by(*ordering)
+            .values_list('pub_date', 'pk')[:stop]
+        ]
+        merged = heapq.merge(live, archived, reverse=True)
+        keys = [(pk, is_live) for _, pk, is_live in merged][index]
+        live_ids = [pk for pk, is_live in keys if is_live]
+        archived_ids = [pk for pk, is_live in keys if not is_live]
+        posts = self.live().in_bulk(live_ids) if live_ids else {}
+        if archived_ids:
+            posts.update(
+                (post.pk, post) for post in
+                to_posts(self.archived().filter(pk__in=archived_ids))
+            )
+        return [posts[pk] for pk, _ in keys if pk in posts]
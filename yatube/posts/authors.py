@@ -0,0 +1,51 @@
+"""Кеш авторов по username для страниц профиля.
+
+Профиль читают чаще всего остального, в том числе роботы, поэтому
+id автора и поля для шаблона берём из кеша, а не запросом к таблице
+пользователей. Неизвестные имена тоже кешируются (на меньший срок),
+чтобы перебор несуществующих профилей не доходил до БД.
+
+Записи лежат в кеше процесса, а их ключи включают версию AUTHORS из
+общего кеша версий. Регистрация, смена имени и удаление пользователя
+повышают её, и все процессы сразу перестают читать старые записи.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404
+
+from .cache import bump_feed_versions, get_feed_version
+from .models import User
+
+AUTHORS = 'authors'
+KEY = 'profile_author:{}:{}'
+FIELDS = ('id', 'username', 'first_name', 'last_name')
+# Отметка «такого пользователя нет»: None кеш возвращает и при промахе
+MISSING = ()
+
+
+def get_author(username):
+    """Автор с полями FIELDS или None; остальные поля отложены."""
+    key = KEY.format(get_feed_version(AUTHORS), username)
+    values = cache.get(key)
+    if values is None:
+        values = User.objects.filter(username=username).values_list(
+            *FIELDS).first()
+        if values is None:
+            values = MISSING
+            cache.set(key, values, settings.AUTHOR_CACHE_MISS_TIMEOUT)
+        else:
+            cache.set(key, values, settings.AUTHOR_CACHE_TIMEOUT)
+    if values == MISSING:
+        return None
+    return User.from_db(None, FIELDS, values)
+
+
+def get_author_or_404(username):
+    author = get_author(username)
+    if author is None:
+        raise Http404('Пользователь не найден')
+    return author
+
+
+def invalidate():
+    bump_feed_versions([AUTHORS])
@@ -0,0 +1,100 @@
+"""Версии лент для версионного кеша.
+
+У каждой ленты (общая, группы, автора) есть счётчик версии в кеше.
+Версия входит в ключи закешированных фрагментов, поэтому изменение
+поста не удаляет записи, а лишь повышает версии затронутых лент:
+старые фрагменты перестают читаться и вытесняются по таймауту.
+
+Сами счётчики лежат в отдельном кеше FEED_VERSION_CACHE_ALIAS, общем
+для всех процессов сервера: повышение версии в одном процессе сразу
+видят остальные. Фрагменты могут оставаться в локальном кеше процесса.
+
+Запрос, читающий с реплики, строит ключи и ETag по read_version: к
+версии добавляется поколение копии реплики, см. core.routers.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from core.routers import replica_generation
+
+VERSION_KEY = 'feed_version:{}'
+INDEX_FEED = 'index'
+# Версии данных, которые показывают все ленты: группы постов и имена
+# авторов. Их изменение не трогает версии самих лент
+GROUPS = 'groups'
+USERS = 'users'
+
+
+def group_feed(group_id):
+    return f'group:{group_id}'
+
+
+def author_feed(author_id):
+    return f'author:{author_id}'
+
+
+def post_feeds(post):
+    """Ленты, в которых показывается пост."""
+    feeds = [INDEX_FEED, author_feed(post.author_id)]
+    if post.group_id:
+        feeds.append(group_feed(post.group_id))
+    return feeds
+
+
+def _initial_version():
+    # Начинаем с текущего времени, а не с единицы: если ключ версии
+    # вытеснят из кеша, новая версия не совпадёт ни с одной из старых
+    return int(time.time() * 1000)
+
+
+def version_cache():
+    return caches[settings.FEED_VERSION_CACHE_ALIAS]
+
+
+def get_feed_version(feed):
+    cache = version_cache()
+    key = VERSION_KEY.format(feed)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _initial_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_feed_versions(feeds):
+    cache = version_cache()
+    for feed in set(feeds):
+        key = VERSION_KEY.format(feed)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _initial_version(), None)
+
+
+def read_version(feed):
+    """Версия ленты для того, что прочитано в текущем запросе.
+
+    Реплика может ещё не содержать изменение, которое повысило версию,
+    поэтому прочитанное с неё кешируется отдельно от основной БД.
+    """
+    version = get_feed_version(feed)
+    generation = replica_generation()
+    if generation is None:
+        return version
+    return f'{version}-r{generation}'
+
+
+def shared_version():
+    """Общая для всех лент часть ключей и ETag: версии групп и имён
+    авторов."""
+    return f'{get_feed_version(GROUPS)}.{get_feed_version(USERS)}'
+
+
+def feed_cache_key(feed, page_obj):
+    """Ключ фрагмента: лента, её версия, общая версия и страница."""
+    page = getattr(page_obj, 'number', None)
+    if page is None:
+        page = f'cursor:{page_obj.cursor}'
+    return f'{feed}:{read_version(feed)}:{shared_version()}:{page}'
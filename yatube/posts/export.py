@@ -0,0 +1,78 @@
+"""Потоковая выгрузка постов в JSONL и CSV.
+
+Строки читаются через values().iterator(), поэтому в памяти находится
+не больше одной пачки строк, сколько бы постов ни было у автора.
+Выгрузка полная: архивные посты идут вместе с остальными. Формат
+совпадает с тем, что принимает команда import_posts.
+"""
+import csv
+import heapq
+import json
+
+from .models import ArchivedPost, Post
+
+FORMATS = {
+    'jsonl': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+COLUMNS = ('id', 'text', 'author', 'group', 'pub_date')
+# Поля values() для колонок выгрузки
+VALUES = {
+    'id': 'id',
+    'text': 'text',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'pub_date': 'pub_date',
+}
+CHUNK_SIZE = 2000
+
+
+class Echo:
+    """Псевдофайл для csv.writer: возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def sources(**filters):
+    """Выборки постов и архивных постов по одним и тем же filters."""
+    return [
+        Post.objects.filter(**filters),
+        ArchivedPost.objects.filter(**filters),
+    ]
+
+
+def iter_rows(querysets, chunk_size=CHUNK_SIZE):
+    streams = [
+        queryset.order_by('pk').values_list(
+            *(VALUES[column] for column in COLUMNS)
+        ).iterator(chunk_size=chunk_size)
+        for queryset in querysets
+    ]
+    # id архивного поста - id исходного, поэтому выборки сливаются в
+    # общий порядок по id
+    for row in heapq.merge(*streams):
+        row = dict(zip(COLUMNS, row))
+        # isoformat, а не DjangoJSONEncoder: тот обрезает микросекунды
+        row['pub_date'] = row['pub_date'].isoformat()
+        yield row
+
+
+def iter_jsonl(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+def iter_csv(rows):
+    writer = csv.DictWriter(Echo(), fieldnames=COLUMNS)
+    yield writer.writeheader()
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def export(querysets, fmt, chunk_size=CHUNK_SIZE):
+    """Генератор строк выгрузки querysets в формате fmt."""
+    rows = iter_rows(querysets, chunk_size)
+    if fmt == 'csv':
+        return iter_csv(rows)
+    return iter_jsonl(rows)
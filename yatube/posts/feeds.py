@@ -0,0 +1,166 @@
+"""Ленты RSS и Atom: общая, группы и автора.
+
+Готовый XML лежит в кеше под ключом с версией ленты, а ETag строится из
+того же ключа. Читатель лент, который опрашивает сайт каждые несколько
+минут, обходится поиском в кеше или ответом 304 без запросов постов.
+"""
+import hashlib
+
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.core.cache import cache
+from django.http import Http404, HttpResponse
+from django.template.defaultfilters import truncatechars
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed
+from django.views.decorators.http import condition
+
+from core.routers import replica_reads
+
+from .authors import get_author, get_author_or_404
+from .cache import (INDEX_FEED, author_feed, group_feed, read_version,
+                    shared_version)
+from .groups import registry
+from .models import Post
+
+
+class PostsFeed(Feed):
+    """Общая лента в RSS 2.0."""
+    title = 'Последние обновления на сайте'
+    description = 'Новые записи всех авторов'
+
+    def link(self, obj):
+        return reverse('posts:index')
+
+    def items(self, obj):
+        return Post.objects.for_feed()[:settings.SYNDICATION_POSTS]
+
+    def item_title(self, item):
+        return truncatechars(item.text, settings.POST_LIMIT)
+
+    def item_description(self, item):
+        return item.text
+
+    def item_link(self, item):
+        return reverse('posts:post_detail', args=(item.pk,))
+
+    def item_pubdate(self, item):
+        return item.pub_date
+
+    def item_updateddate(self, item):
+        return item.updated_at
+
+    def item_author_name(self, item):
+        return item.author.get_full_name() or item.author.username
+
+    def item_categories(self, item):
+        return (item.group.title,) if item.group_id else ()
+
+
+class GroupPostsFeed(PostsFeed):
+    def get_object(self, request, slug):
+        group = registry.get_by_slug(slug)
+        if group is None:
+            raise Http404('Группа не найдена')
+        return group
+
+    def title(self, obj):
+        return obj.title
+
+    def description(self, obj):
+        return obj.description
+
+    def link(self, obj):
+        return reverse('posts:group_list', args=(obj.slug,))
+
+    def items(self, obj):
+        return obj.posts.for_feed()[:settings.SYNDICATION_POSTS]
+
+
+class ProfileFeed(PostsFeed):
+    def get_object(self, request, username):
+        return get_author_or_404(username)
+
+    def title(self, obj):
+        return f'Записи {obj.get_full_name() or obj.username}'
+
+    def description(self, obj):
+        return self.title(obj)
+
+    def link(self, obj):
+        return reverse('posts:profile', args=(obj.username,))
+
+    def items(self, obj):
+        return obj.posts.for_feed()[:settings.SYNDICATION_POSTS]
+
+
+def atom(feed_class):
+    """Тот же класс ленты в формате Atom."""
+    return type(
+        f'Atom{feed_class.__name__}', (feed_class,), {
+            'feed_type': Atom1Feed,
+            'subtitle': feed_class.description,
+        }
+    )
+
+
+def index_feed_name():
+    return INDEX_FEED
+
+
+def group_feed_name(slug):
+    group = registry.get_by_slug(slug)
+    return group and group_feed(group.pk)
+
+
+def profile_feed_name(username):
+    author = get_author(username)
+    return author and author_feed(author.pk)
+
+
+def cached_feed(feed_class, get_feed):
+    """Представление ленты feed_class с кешем XML по версии ленты.
+
+    get_feed по аргументам URL возвращает ленту из posts.cache или
+    None, если объекта ленты нет. В ключ входит и общая версия: названия
+    групп и имена авторов стоят в записях.
+    """
+    feed = feed_class()
+    feed_type = feed_class.feed_type.__name__
+
+    def cache_key(request, kwargs):
+        name = get_feed(**kwargs)
+        if not name:
+            return None
+        # Ссылки в XML абсолютные, поэтому ключ зависит и от хоста
+        return ':'.join(map(str, (
+            'syndication', feed_type, request.get_host(), name,
+            read_version(name), shared_version(),
+        )))
+
+    def etag(request, **kwargs):
+        key = cache_key(request, kwargs)
+        return key and hashlib.md5(key.encode()).hexdigest()
+
+    @replica_reads
+    @condition(etag_func=etag)
+    def view(request, **kwargs):
+        key = cache_key(request, kwargs)
+        if key is None:
+            raise Http404('Лента не найдена')
+        cached = cache.get(key)
+        if cached is None:
+            response = feed(request, **kwargs)
+            cached = (response['Content-Type'], response.content)
+            cache.set(key, cached, settings.FEED_CACHE_TIMEOUT)
+        content_type, content = cached
+        return HttpResponse(content, content_type=content_type)
+    return view
+
+
+index_rss = cached_feed(PostsFeed, index_feed_name)
+index_atom = cached_feed(atom(PostsFeed), index_feed_name)
+group_rss = cached_feed(GroupPostsFeed, group_feed_name)
+group_atom = cached_feed(atom(GroupPostsFeed), group_feed_name)
+profile_rss = cached_feed(ProfileFeed, profile_feed_name)
+profile_atom = cached_feed(atom(ProfileFeed), profile_feed_name)
@@ -1,4 +1,6 @@
 from django import forms
+from django.conf import settings
+from django.template.defaultfilters import filesizeformat
 
 from .models import Post
 
@@ -6,8 +8,18 @@ from .models import Post
 class PostForm(forms.ModelForm):
     class Meta:
         model = Post
-        fields = ['text', 'group']
+        fields = ['text', 'group', 'image']
         help_texts = {
             'text': 'Текст нового поста',
             'group': 'Группа, к которой будет относиться пост',
+            'image': 'Картинка к посту',
         }
+
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if image and image.size > settings.POST_IMAGE_MAX_SIZE:
+            raise forms.ValidationError(
+                'Картинка больше '
+                f'{filesizeformat(settings.POST_IMAGE_MAX_SIZE)}'
+            )
+        return image
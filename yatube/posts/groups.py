@@ -0,0 +1,59 @@
+"""Снимок всех групп в памяти процесса.
+
+Групп мало и меняются они редко, а нужны почти на каждой странице:
+группа поста в лентах и группа по slug в group_posts. Поэтому каждый
+процесс держит снимок таблицы групп и сверяет его с версией в общем
+кеше - один быстрый get вместо JOIN и запроса по slug. Сохранение и
+удаление группы (в том числе в админке) повышает версию, и все
+процессы перечитывают снимок при следующем обращении.
+
+Объекты групп общие для всех запросов процесса: менять их нельзя.
+"""
+import threading
+
+from django.db import DEFAULT_DB_ALIAS
+
+from .cache import GROUPS, bump_feed_versions, get_feed_version
+from .models import Group
+
+
+class GroupRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        # Пара словарей по id и по slug заменяется целиком
+        self._groups = ({}, {})
+
+    def _snapshot(self):
+        version = get_feed_version(GROUPS)
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    # Снимок живёт долго, отстающая реплика для него не
+                    # годится
+                    groups = list(Group.objects.using(DEFAULT_DB_ALIAS))
+                    self._groups = (
+                        {group.pk: group for group in groups},
+                        {group.slug: group for group in groups},
+                    )
+                    self._version = version
+        return self._groups
+
+    def reset(self):
+        """Забыть снимок, например после отката транзакции в тестах."""
+        with self._lock:
+            self._version = None
+
+    def by_id(self):
+        """Словарь id -> группа по актуальной версии."""
+        return self._snapshot()[0]
+
+    def get_by_slug(self, slug):
+        return self._snapshot()[1].get(slug)
+
+
+registry = GroupRegistry()
+
+
+def invalidate():
+    bump_feed_versions([GROUPS])
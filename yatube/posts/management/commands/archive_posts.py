@@ -0,0 +1,43 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from posts.archive import archive_batch
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит посты старше ARCHIVE_AFTER_DAYS дней в архивную '
+        'таблицу пачками по ARCHIVE_BATCH_SIZE; каждая пачка - отдельная '
+        'транзакция, поэтому прерванный перенос можно просто повторить.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.ARCHIVE_AFTER_DAYS)
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.ARCHIVE_BATCH_SIZE)
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только посчитать посты, которые попадут в архив.'
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        if options['dry_run']:
+            total = Post.objects.filter(pub_date__lt=cutoff).count()
+            self.stdout.write(f'В архив попадут постов: {total}')
+            return
+        total = 0
+        while True:
+            moved = archive_batch(cutoff, options['batch_size'])
+            if not moved:
+                break
+            total += moved
+            self.stdout.write(f'перенесено {total}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено в архив постов: {total}'
+        ))
@@ -0,0 +1,81 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from core.benchmark import benchmark_database, measure, seed, summary
+from posts import api
+from posts.models import Group
+from posts.views import POSTS_ON_PAGE
+
+# Проекция ленты без текста постов, как у списка в мобильном клиенте
+SHORT_FIELDS = 'id,author,group,pub_date'
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает HTML-ленты с JSON API на отдельной БД со '
+        'сгенерированными данными: размер ответа и время сервера на '
+        'страницу и на пост.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=50000)
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Чистить кеш перед каждым запросом: HTML-ленты без '
+                 'закешированных фрагментов.'
+        )
+
+    @override_settings(DEBUG=False)
+    def handle(self, *args, **options):
+        with benchmark_database():
+            self.stdout.write('Генерируем данные...')
+            author_ids, group_ids = seed(
+                options['users'], options['groups'], options['posts'])
+            client = Client()
+            for name, (html, json) in self.feeds(
+                    author_ids[0], group_ids[0]).items():
+                self.stdout.write(self.style.MIGRATE_HEADING(name))
+                variants = (
+                    ('HTML', html, {}, POSTS_ON_PAGE),
+                    ('JSON', json, {}, api.POSTS_ON_PAGE),
+                    ('JSON без текста', json, {'fields': SHORT_FIELDS},
+                     api.POSTS_ON_PAGE),
+                )
+                for label, url, params, per_page in variants:
+                    self.report(label, client, url, params, per_page,
+                                options['repeat'], options['cold'])
+
+    @staticmethod
+    def feeds(author_id, group_id):
+        username = get_user_model().objects.get(pk=author_id).username
+        slug = Group.objects.get(pk=group_id).slug
+        return {
+            'index': (reverse('posts:index'), reverse('posts:api_index')),
+            'group_posts': (
+                reverse('posts:group_list', kwargs={'slug': slug}),
+                reverse('posts:api_group_list', kwargs={'slug': slug}),
+            ),
+            'profile': (
+                reverse('posts:profile', kwargs={'username': username}),
+                reverse('posts:api_profile', kwargs={'username': username}),
+            ),
+        }
+
+    def report(self, label, client, url, params, per_page, repeat, cold):
+        def fetch():
+            if cold:
+                cache.clear()
+            return client.get(url, params)
+
+        size = len(fetch().content)
+        stats = summary(measure(fetch, repeat))
+        self.stdout.write(
+            f'  {label:<16} {size:>8} байт ({size // per_page:>5} на пост)  '
+            f'p50 {stats["p50"]:>8} мс  p95 {stats["p95"]:>8} мс'
+        )
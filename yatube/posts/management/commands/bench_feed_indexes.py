@@ -0,0 +1,88 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from core.benchmark import benchmark_database, measure, seed, summary
+from posts.models import Post
+
+FEED_INDEXES = (
+    'post_pub_date_idx',
+    'post_group_pub_date_idx',
+    'post_author_pub_date_idx',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает время запросов лент с индексами по pub_date и без них '
+        'на отдельной БД со сгенерированными данными.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=100)
+        parser.add_argument('--posts', type=int, default=200000)
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            self.stdout.write('Генерируем данные...')
+            author_ids, group_ids = seed(
+                options['users'], options['groups'], options['posts'])
+            queries = self.feed_queries(author_ids[0], group_ids[0])
+            with_indexes = self.run(queries, options['repeat'])
+            indexes = self.drop_indexes()
+            without_indexes = self.run(queries, options['repeat'])
+            self.restore_indexes(indexes)
+        self.report(with_indexes, without_indexes)
+
+    @staticmethod
+    def feed_queries(author_id, group_id):
+        feeds = Post.objects.for_feed()
+        return {
+            'index': feeds,
+            'group_posts': feeds.filter(group_id=group_id),
+            'profile': feeds.filter(author_id=author_id),
+        }
+
+    @staticmethod
+    def run(queries, repeat):
+        results = {}
+        for name, queryset in queries.items():
+            with connection.cursor() as cursor:
+                sql, params = queryset[:10].query.sql_with_params()
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+                plan = '; '.join(row[-1] for row in cursor.fetchall())
+            samples = measure(lambda: list(queryset[:10]), repeat)
+            results[name] = dict(summary(samples), plan=plan)
+        return results
+
+    @staticmethod
+    def drop_indexes():
+        indexes = [
+            index for index in Post._meta.indexes
+            if index.name in FEED_INDEXES
+        ]
+        with connection.schema_editor() as editor:
+            for index in indexes:
+                editor.remove_index(Post, index)
+        return indexes
+
+    @staticmethod
+    def restore_indexes(indexes):
+        with connection.schema_editor() as editor:
+            for index in indexes:
+                editor.add_index(Post, index)
+
+    def report(self, with_indexes, without_indexes):
+        for name in with_indexes:
+            before = without_indexes[name]
+            after = with_indexes[name]
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(
+                f'  без индексов: p50 {before["p50"]} мс, '
+                f'p95 {before["p95"]} мс | {before["plan"]}'
+            )
+            self.stdout.write(
+                f'  с индексами:  p50 {after["p50"]} мс, '
+                f'p95 {after["p95"]} мс | {after["plan"]}'
+            )
@@ -0,0 +1,109 @@
+import itertools
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.test import override_settings
+
+from core.benchmark import SEED, benchmark_database, measure, seed, summary
+from posts import timeline
+from posts.models import AuthorStats, Follow, Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает ленту подписок, собранную при чтении, с '
+        'материализованной лентой (fan-out on write) на отдельной БД со '
+        'сгенерированными данными: время чтения страниц и цену публикации.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=20000)
+        parser.add_argument(
+            '--follows', type=int, default=50,
+            help='На сколько авторов подписан каждый пользователь.'
+        )
+        parser.add_argument(
+            '--deep-page', type=int, default=20,
+            help='Номер глубокой страницы для второго замера чтения.'
+        )
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        rnd = random.Random(SEED)
+        with benchmark_database():
+            self.stdout.write('Генерируем данные...')
+            author_ids, _ = seed(
+                options['users'], options['groups'], options['posts'])
+            self.follow(rnd, author_ids, options['follows'])
+            started = time.perf_counter()
+            timeline.fan_out_after(0)
+            self.stdout.write(
+                f'Раскладка всех постов по лентам: '
+                f'{time.perf_counter() - started:.1f} с'
+            )
+            readers = itertools.cycle(rnd.sample(author_ids, 20))
+            for page in (1, options['deep_page']):
+                self.report_reads(readers, page, options['repeat'])
+            self.report_writes(rnd, author_ids, options['repeat'])
+
+    def follow(self, rnd, author_ids, follows):
+        Follow.objects.bulk_create(
+            (
+                Follow(user_id=user_id, author_id=author_id)
+                for user_id in author_ids
+                for author_id in rnd.sample(author_ids, follows)
+                if author_id != user_id
+            )
+        )
+        posts = dict(Post.objects.values_list('author').annotate(
+            Count('pk')).order_by())
+        followers = dict(Follow.objects.values_list('author').annotate(
+            Count('pk')).order_by())
+        AuthorStats.objects.bulk_create(
+            AuthorStats(
+                user_id=author_id,
+                posts_count=posts.get(author_id, 0),
+                followers_count=followers.get(author_id, 0)
+            )
+            for author_id in author_ids
+        )
+
+    def report_reads(self, readers, page, repeat):
+        start = (page - 1) * 10
+        stop = start + 10
+
+        def on_read():
+            followed = Follow.objects.filter(
+                user_id=next(readers)).values('author_id')
+            list(Post.objects.for_feed().filter(
+                author__in=followed)[start:stop])
+
+        def on_write():
+            feed = timeline.FollowFeed(next(readers))
+            feed[start:stop]
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f'Страница {page}'))
+        self.write_row('сборка при чтении', measure(on_read, repeat))
+        self.write_row('раскладка при записи', measure(on_write, repeat))
+
+    def report_writes(self, rnd, author_ids, repeat):
+        def publish():
+            Post.objects.create(
+                author_id=rnd.choice(author_ids), text='benchmark')
+
+        self.stdout.write(self.style.MIGRATE_HEADING('Публикация поста'))
+        # Отрицательный порог - все авторы читаются при чтении, раскладки нет
+        with override_settings(FANOUT_FOLLOWERS_LIMIT=-1):
+            self.write_row('сборка при чтении', measure(publish, repeat))
+        self.write_row('раскладка при записи', measure(publish, repeat))
+
+    def write_row(self, name, samples):
+        stats = summary(samples)
+        self.stdout.write(
+            f'  {name:<22} p50 {stats["p50"]:>8} мс  '
+            f'p95 {stats["p95"]:>8} мс  p99 {stats["p99"]:>8} мс'
+        )
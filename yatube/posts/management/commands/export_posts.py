@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import export
+from posts.models import Group, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоково выгружает посты автора, группы или все посты, включая '
+        'архивные, в JSONL или CSV, не загружая таблицу в память.'
+    )
+
+    def add_arguments(self, parser):
+        scope = parser.add_mutually_exclusive_group()
+        scope.add_argument('--author', help='username автора.')
+        scope.add_argument('--group', help='slug группы.')
+        parser.add_argument(
+            '--format', choices=tuple(export.FORMATS), default='jsonl')
+        parser.add_argument(
+            '--output', default='-',
+            help='Файл для выгрузки, по умолчанию stdout.'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=export.CHUNK_SIZE,
+            help='Сколько строк читать из БД за раз.'
+        )
+
+    def handle(self, *args, **options):
+        filters = {}
+        if options['author']:
+            if not User.objects.filter(username=options['author']).exists():
+                raise CommandError(f'Нет автора {options["author"]}.')
+            filters['author__username'] = options['author']
+        if options['group']:
+            if not Group.objects.filter(slug=options['group']).exists():
+                raise CommandError(f'Нет группы {options["group"]}.')
+            filters['group__slug'] = options['group']
+        lines = export.export(
+            export.sources(**filters), options['format'],
+            options['chunk_size'])
+        if options['output'] == '-':
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        exported = 0
+        with open(options['output'], 'w', encoding='utf-8',
+                  newline='') as output:
+            for exported, line in enumerate(lines, 1):
+                output.write(line)
+        self.stderr.write(f'Выгружено строк: {exported}')
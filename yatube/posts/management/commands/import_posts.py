@@ -0,0 +1,185 @@
+import csv
+import itertools
+import json
+import sys
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core.utils import auto_now_add_disabled
+from posts import search, timeline
+from posts.cache import (INDEX_FEED, author_feed, bump_feed_versions,
+                         group_feed)
+from posts.models import AuthorStats, Group, Post, User
+
+FORMATS = ('jsonl', 'csv')
+# Сколько пропущенных записей показать целиком
+MAX_REPORTED_SKIPS = 10
+
+
+def parse_pub_date(value, default):
+    """Дата из ISO 8601; без даты - default, битая дата - None."""
+    if not value:
+        return default
+    if not isinstance(value, str):
+        return None
+    try:
+        pub_date = parse_datetime(value)
+    except ValueError:
+        return None
+    if pub_date is not None and timezone.is_naive(pub_date):
+        pub_date = timezone.make_aware(pub_date)
+    return pub_date
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоково загружает посты из JSONL или CSV пачками через '
+        'bulk_create. Поля записи: text, author (username), '
+        'group (slug, необязательно), pub_date (ISO 8601, необязательно).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', help='Файл с постами или "-" для чтения из stdin.')
+        parser.add_argument(
+            '--format', choices=FORMATS,
+            help='Формат файла; по умолчанию определяется по расширению.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько постов вставлять одной транзакцией.'
+        )
+        parser.add_argument(
+            '--offset', type=int, default=0,
+            help='Пропустить первые N записей, чтобы продолжить загрузку.'
+        )
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or self.guess_format(options['path'])
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше нуля.')
+        authors = dict(User.objects.values_list('username', 'pk'))
+        groups = dict(Group.objects.values_list('slug', 'pk'))
+        stream = self.open(options['path'])
+        try:
+            records = itertools.islice(
+                self.read(stream, fmt), options['offset'], None)
+            self.load(records, authors, groups, options)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+    @staticmethod
+    def guess_format(path):
+        for fmt in FORMATS:
+            if path.endswith(f'.{fmt}'):
+                return fmt
+        raise CommandError('Не удалось определить формат, укажите --format.')
+
+    @staticmethod
+    def open(path):
+        if path == '-':
+            return sys.stdin
+        return open(path, encoding='utf-8', newline='')
+
+    @staticmethod
+    def read(stream, fmt):
+        if fmt == 'csv':
+            yield from csv.DictReader(stream)
+            return
+        for line in stream:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                # Строку как есть: build пропустит её, а смещение в
+                # потоке её учтёт
+                yield line.rstrip('\n')
+
+    def build(self, records, authors, groups, now):
+        """Превращает записи в несохранённые посты.
+
+        На месте битой записи отдаёт None, чтобы смещение в исходном
+        потоке считалось по всем записям.
+        """
+        for record in records:
+            post = self.parse(record, authors, groups, now)
+            if post is None:
+                self.skip(record)
+            yield post
+
+    @staticmethod
+    def parse(record, authors, groups, now):
+        """Пост из записи или None, если запись битая."""
+        if not isinstance(record, dict):
+            return None
+        text, author, slug = (
+            record.get(field) for field in ('text', 'author', 'group'))
+        if not (text and isinstance(text, str) and isinstance(author, str)):
+            return None
+        if slug and not isinstance(slug, str):
+            return None
+        author_id = authors.get(author)
+        group_id = groups.get(slug) if slug else None
+        pub_date = parse_pub_date(record.get('pub_date'), now)
+        if author_id is None or pub_date is None or (slug and not group_id):
+            return None
+        return Post(text=text, author_id=author_id, group_id=group_id,
+                    pub_date=pub_date)
+
+    def skip(self, record):
+        self.skipped += 1
+        if self.skipped <= MAX_REPORTED_SKIPS:
+            self.stderr.write(f'Пропущена запись: {record}')
+
+    def load(self, records, authors, groups, options):
+        batch_size = options['batch_size']
+        offset = options['offset']
+        self.skipped = 0
+        posts = self.build(records, authors, groups, timezone.now())
+        inserted = 0
+        started = time.monotonic()
+        with auto_now_add_disabled(Post, 'pub_date'):
+            while True:
+                chunk = list(itertools.islice(posts, batch_size))
+                if not chunk:
+                    break
+                offset += len(chunk)
+                batch = [post for post in chunk if post is not None]
+                if batch:
+                    self.insert(batch)
+                inserted += len(batch)
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f'offset {offset}: вставлено {inserted}, '
+                    f'пропущено {self.skipped}, '
+                    f'{inserted / elapsed if elapsed else 0:.0f} постов/с'
+                )
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: вставлено {inserted}, пропущено {self.skipped}.'
+        ))
+
+    @staticmethod
+    def insert(batch):
+        """Вставляет пачку и повторяет то, что для save() делают сигналы."""
+        with transaction.atomic():
+            last_pk = Post.objects.order_by('-pk').values_list(
+                'pk', flat=True).first() or 0
+            Post.objects.bulk_create(batch)
+            per_author = Counter(post.author_id for post in batch)
+            for author_id, count in per_author.items():
+                AuthorStats.change_posts_count(author_id, count)
+            if search.is_available():
+                search.index_after(last_pk)
+            timeline.fan_out_after(last_pk)
+        feeds = [INDEX_FEED]
+        feeds += [author_feed(author_id) for author_id in per_author]
+        feeds += [group_feed(post.group_id) for post in batch
+                  if post.group_id]
+        bump_feed_versions(feeds)
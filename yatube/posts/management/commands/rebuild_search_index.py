@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает полнотекстовый индекс FTS5 по тексту постов.'
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            raise CommandError('Индекс FTS5 доступен только для SQLite.')
+        indexed = search.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Проиндексировано постов: {indexed}'
+        ))
@@ -0,0 +1,52 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from posts.models import ArchivedPost, AuthorStats, Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Сверяет денормализованные счётчики постов авторов с таблицей '
+        'постов и исправляет расхождения.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать расхождения, ничего не меняя.'
+        )
+
+    def handle(self, *args, **options):
+        actual = Counter()
+        # Архивные посты по-прежнему посты автора
+        for model in (Post, ArchivedPost):
+            actual.update(dict(
+                model.objects.values_list('author').annotate(Count('pk'))
+                .order_by()
+            ))
+        stored = dict(
+            AuthorStats.objects.values_list('user_id', 'posts_count')
+        )
+        drift = {
+            author_id: actual.get(author_id, 0)
+            for author_id in actual.keys() | stored.keys()
+            if actual.get(author_id, 0) != stored.get(author_id)
+        }
+        for author_id, posts_count in sorted(drift.items()):
+            self.stdout.write(
+                f'автор {author_id}: {stored.get(author_id)} -> '
+                f'{posts_count}'
+            )
+        if drift and not options['dry_run']:
+            with transaction.atomic():
+                for author_id, posts_count in drift.items():
+                    AuthorStats.objects.update_or_create(
+                        user_id=author_id,
+                        defaults={'posts_count': posts_count}
+                    )
+        self.stdout.write(self.style.SUCCESS(
+            f'Расхождений: {len(drift)}'
+        ))
@@ -5,6 +5,34 @@ from django.contrib.auth import get_user_model
 User = get_user_model()
 
 
+class GroupAttachingIterable(models.query.ModelIterable):
+    """Подставляет постам группы из снимка в памяти процесса."""
+
+    def __iter__(self):
+        from .groups import registry
+        groups = registry.by_id()
+        field = Post._meta.get_field('group')
+        for post in super().__iter__():
+            group = groups.get(post.group_id)
+            # Группа, которой ещё нет в снимке, загрузится как обычно
+            if group is not None:
+                field.set_cached_value(post, group)
+            yield post
+
+
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Посты вместе с автором одним JOIN-запросом и группой из
+        снимка групп.
+
+        Шаблоны лент обращаются к post.author и post.group для каждой
+        записи, иначе это по запросу на строку.
+        """
+        queryset = self.select_related('author')
+        queryset._iterable_class = GroupAttachingIterable
+        return queryset
+
+
 class Post(models.Model):
     text = models.TextField(
         verbose_name='Содержание поста',
@@ -14,6 +42,10 @@ class Post(models.Model):
         verbose_name='Дата публикации',
         auto_now_add=True
     )
+    updated_at = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True
+    )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -29,9 +61,31 @@ class Post(models.Model):
         verbose_name='Группа',
         help_text='Группа, к которой будет относиться пост'
     )
+    image = models.ImageField(
+        verbose_name='Картинка',
+        upload_to='posts/',
+        blank=True,
+        help_text='Картинка к посту'
+    )
+
+    objects = PostQuerySet.as_manager()
+    # Настоящий пост из таблицы постов, см. ArchivedPost.as_post
+    is_archived = False
 
     class Meta:
         ordering = ('-pub_date',)
+        # Индексы под ленты: общая, группы и автора сортируются по дате
+        indexes = (
+            models.Index(fields=('-pub_date',), name='post_pub_date_idx'),
+            models.Index(
+                fields=('group', '-pub_date'),
+                name='post_group_pub_date_idx'
+            ),
+            models.Index(
+                fields=('author', '-pub_date'),
+                name='post_author_pub_date_idx'
+            ),
+        )
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
 
@@ -39,6 +93,137 @@ class Post(models.Model):
         return self.text[:settings.POST_LIMIT]
 
 
+class ArchivedPost(models.Model):
+    """Старый пост, перенесённый командой archive_posts.
+
+    Таблица постов и её индексы остаются маленькими, а в архив ходят
+    только страница поста и дальние страницы профиля. id совпадает с
+    id исходного поста, поэтому ссылки на пост продолжают работать.
+    """
+    id = models.IntegerField(primary_key=True)
+    text = models.TextField(verbose_name='Содержание поста')
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+    updated_at = models.DateTimeField(verbose_name='Дата изменения')
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='archived_posts',
+        verbose_name='Автор'
+    )
+    group = models.ForeignKey(
+        'Group',
+        blank=True,
+        null=True,
+        on_delete=models.SET_NULL,
+        related_name='archived_posts',
+        verbose_name='Группа'
+    )
+    image = models.CharField(
+        max_length=100,
+        blank=True,
+        verbose_name='Картинка'
+    )
+
+    class Meta:
+        ordering = ('-pub_date',)
+        indexes = (
+            models.Index(
+                fields=('author', '-pub_date'),
+                name='archived_author_pub_date_idx'
+            ),
+        )
+        verbose_name = 'Архивный пост'
+        verbose_name_plural = 'Архивные посты'
+
+    def __str__(self) -> str:
+        return self.text[:settings.POST_LIMIT]
+
+    def as_post(self):
+        """Пост для шаблонов; загруженный автор переносится в него."""
+        post = Post(
+            id=self.id, text=self.text, pub_date=self.pub_date,
+            updated_at=self.updated_at, author_id=self.author_id,
+            group_id=self.group_id, image=self.image
+        )
+        post._state.adding = False
+        post.is_archived = True
+        if ArchivedPost.author.is_cached(self):
+            Post.author.field.set_cached_value(post, self.author)
+        return post
+
+
+class AuthorStats(models.Model):
+    """Денормализованные счётчики автора.
+
+    Счётчики поддерживаются сигналами атомарным UPDATE с F(); счётчик
+    постов сверяется командой reconcile_post_counts.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Автор'
+    )
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество постов'
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество подписчиков'
+    )
+
+    class Meta:
+        verbose_name = 'Статистика автора'
+        verbose_name_plural = 'Статистика авторов'
+
+    def __str__(self):
+        return f'{self.user}: {self.posts_count}'
+
+    @classmethod
+    def change_posts_count(cls, author_id, delta):
+        cls._change_counter(author_id, 'posts_count', delta)
+
+    @classmethod
+    def change_followers_count(cls, author_id, delta):
+        cls._change_counter(author_id, 'followers_count', delta)
+
+    @classmethod
+    def _change_counter(cls, author_id, field, delta):
+        updated = cls.objects.filter(user_id=author_id).update(
+            **{field: models.F(field) + delta}
+        )
+        if updated or delta < 0:
+            # При удалении строку не создаём: автор может удаляться
+            # каскадно вместе со своей статистикой
+            return
+        # Строки ещё нет - заводим её сразу с точными значениями
+        _, created = cls.objects.get_or_create(
+            user_id=author_id,
+            defaults={
+                'posts_count': Post.objects.filter(
+                    author_id=author_id).count()
+                + ArchivedPost.objects.filter(author_id=author_id).count(),
+                'followers_count': Follow.objects.filter(
+                    author_id=author_id).count(),
+            }
+        )
+        if not created:
+            cls.objects.filter(user_id=author_id).update(
+                **{field: models.F(field) + delta}
+            )
+
+
+def get_posts_count(author):
+    """Число постов автора из счётчика, без COUNT(*) по таблице постов."""
+    try:
+        return author.stats.posts_count
+    except AuthorStats.DoesNotExist:
+        # Архивные посты тоже посты автора
+        return author.posts.count() + author.archived_posts.count()
+
+
 class Group(models.Model):
     title = models.CharField(
         max_length=200,
@@ -56,6 +241,81 @@ class Group(models.Model):
     class Meta:
         verbose_name_plural = 'Группы'
         verbose_name = 'Группу'
+        # Каталог групп листается курсором по (title, id)
+        indexes = (
+            models.Index(fields=('title', 'id'), name='group_title_idx'),
+        )
 
     def __str__(self):
         return self.title
+
+
+class Follow(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='follower',
+        verbose_name='Подписчик'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='following',
+        verbose_name='Автор'
+    )
+
+    class Meta:
+        verbose_name = 'Подписка'
+        verbose_name_plural = 'Подписки'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'author'), name='unique_follow'),
+            models.CheckConstraint(
+                check=~models.Q(user=models.F('author')),
+                name='no_self_follow'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.user} -> {self.author}'
+
+
+class TimelineEntry(models.Model):
+    """Пост в материализованной ленте подписок пользователя.
+
+    Строки раскладываются при публикации поста (fan-out on write), дата
+    поста продублирована, чтобы лента читалась по одному индексу.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор'
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        verbose_name = 'Запись ленты подписок'
+        verbose_name_plural = 'Записи лент подписок'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'post'), name='unique_timeline_entry'),
+        )
+        indexes = (
+            models.Index(
+                fields=('user', '-pub_date'),
+                name='timeline_user_pub_date_idx'
+            ),
+        )
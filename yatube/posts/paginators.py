@@ -0,0 +1,347 @@
+import base64
+import binascii
+import datetime
+import hashlib
+import heapq
+import itertools
+import json
+from collections.abc import Sequence
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet, ValidationError
+from django.core.paginator import Page, Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+from .cache import INDEX_FEED, read_version
+
+FORWARD = 'n'
+BACKWARD = 'p'
+# Целые вне этого диапазона не помещаются в INTEGER SQLite
+MIN_INTEGER, MAX_INTEGER = -2 ** 63, 2 ** 63 - 1
+
+
+class ElidedPaginator(Paginator):
+    """Paginator с укороченным списком номеров страниц.
+
+    Вместо всех номеров страница получает ``elided_page_range``: первую
+    и последнюю страницы и окно вокруг текущей, пропуски заменены на
+    ``ELLIPSIS``. Размер навигации не зависит от длины ленты. Повторяет
+    ``get_elided_page_range`` из Django 3.2.
+    """
+    ELLIPSIS = '…'
+    page_class = Page
+    count_is_exact = True
+
+    def get_elided_page_range(self, number=1, *, on_each_side=3, on_ends=1):
+        number = self.validate_number(number)
+        if self.num_pages <= (on_each_side + on_ends) * 2:
+            yield from self.page_range
+            return
+        if number > (1 + on_each_side + on_ends) + 1:
+            yield from range(1, on_ends + 1)
+            yield self.ELLIPSIS
+            yield from range(number - on_each_side, number + 1)
+        else:
+            yield from range(1, number + 1)
+        if number < (self.num_pages - on_each_side - on_ends) - 1:
+            yield from range(number + 1, number + on_each_side + 1)
+            yield self.ELLIPSIS
+            yield from range(self.num_pages - on_ends + 1, self.num_pages + 1)
+        else:
+            yield from range(number + 1, self.num_pages + 1)
+
+    def _get_page(self, *args, **kwargs):
+        page = self.page_class(*args, **kwargs)
+        page.elided_page_range = list(
+            self.get_elided_page_range(page.number))
+        page.count_is_exact = self.count_is_exact
+        return page
+
+
+class CachedCountPage(Page):
+    @cached_property
+    def continuation_cursor(self):
+        """Курсор на записи после последней посчитанной страницы.
+
+        Приблизительный счётчик обрывается на лимите, и дальше ленту
+        листает курсор.
+        """
+        if self.count_is_exact or self.has_next() or not len(self):
+            return None
+        paginator = CursorPaginator(
+            self.paginator.object_list, self.paginator.per_page)
+        return paginator.encode_cursor(FORWARD, self[len(self) - 1])
+
+    def has_other_pages(self):
+        return (
+            super().has_other_pages()
+            or self.continuation_cursor is not None
+        )
+
+
+class CachedCountPaginator(ElidedPaginator):
+    """Paginator, который берёт число записей из кеша.
+
+    Ключ счётчика содержит версию ленты, поэтому сохранение или удаление
+    поста делает старое значение недоступным и следующий запрос
+    пересчитает его. Без явной ленты ключ строится по SQL запроса и
+    версии общей ленты - так работают, например, выборки админки.
+
+    В приблизительном режиме считаем не дальше
+    ``settings.APPROXIMATE_COUNT_LIMIT`` записей: для огромной ленты
+    точное число страниц не важно, а глубже лимита ведёт курсор.
+    """
+    page_class = CachedCountPage
+
+    def __init__(self, object_list, per_page, orphans=0,
+                 allow_empty_first_page=True, feed=None, approximate=False):
+        super().__init__(object_list, per_page, orphans,
+                         allow_empty_first_page)
+        self.feed = feed
+        self.approximate = approximate
+        self.count_is_exact = True
+
+    @cached_property
+    def count_cache_key(self):
+        scope = self.feed
+        if scope is None:
+            try:
+                query = str(self.object_list.query).encode()
+            except EmptyResultSet:
+                query = b''
+            scope = hashlib.md5(query).hexdigest()
+        mode = 'approx' if self.approximate else 'exact'
+        version = read_version(self.feed or INDEX_FEED)
+        return f'feed_count:{mode}:{scope}:{version}'
+
+    @cached_property
+    def count(self):
+        cached = cache.get(self.count_cache_key)
+        if cached is None:
+            cached = self._count()
+            cache.set(
+                self.count_cache_key, cached, settings.FEED_CACHE_TIMEOUT)
+        count, self.count_is_exact = cached
+        return count
+
+    def _get_page(self, *args, **kwargs):
+        page = super()._get_page(*args, **kwargs)
+        if not self.count_is_exact:
+            # Последний номер - лишь лимит счётчика: навигация
+            # обрывается многоточием после окна текущей страницы
+            page_range = page.elided_page_range
+            after = page_range.index(page.number) + 1
+            tail = page_range[after:]
+            if self.ELLIPSIS in tail:
+                tail = tail[:tail.index(self.ELLIPSIS)]
+            page.elided_page_range = (
+                page_range[:after] + tail + [self.ELLIPSIS])
+        return page
+
+    def _count(self):
+        if not self.approximate:
+            return Paginator.count.func(self), True
+        limit = settings.APPROXIMATE_COUNT_LIMIT
+        # COUNT(*) по подзапросу с LIMIT читает не больше limit строк
+        count = self.object_list.order_by()[:limit].count()
+        return count, count < limit
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """Сохраняет микросекунды: DjangoJSONEncoder обрезает их до мс."""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class CursorPage(Sequence):
+    """Страница keyset-паджинатора: без номера страницы и общего числа."""
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, next_cursor=None,
+                 previous_cursor=None, cursor=''):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.cursor = cursor
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return '<CursorPage of %s objects>' % len(self)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Паджинация по ключу сортировки вместо OFFSET.
+
+    Каждая страница - это один запрос ``WHERE (pub_date, id) < (...)
+    LIMIT per_page + 1``, поэтому глубокие страницы стоят столько же,
+    сколько первая, а ``COUNT(*)`` не выполняется вовсе.
+    """
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-pk')):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+
+    def get_page(self, cursor=None):
+        """Возвращает страницу по курсору; битый курсор - первая страница."""
+        direction, position = self.decode_cursor(cursor)
+        ordering = self.ordering
+        if direction == BACKWARD:
+            ordering = tuple(_reverse(field) for field in ordering)
+        rows = self._rows(ordering, position, self.per_page + 1)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == BACKWARD:
+            rows.reverse()
+        has_next = has_more if direction == FORWARD else True
+        has_previous = (
+            position is not None if direction == FORWARD else has_more
+        )
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = self.encode_cursor(FORWARD, rows[-1])
+        if rows and has_previous:
+            previous_cursor = self.encode_cursor(BACKWARD, rows[0])
+        return CursorPage(
+            rows, self, next_cursor, previous_cursor, cursor or '')
+
+    def _rows(self, ordering, position, limit):
+        return _rows_after(self.object_list, ordering, position, limit)
+
+    def encode_cursor(self, direction, row):
+        values = [_value(row, field.lstrip('-')) for field in self.ordering]
+        payload = json.dumps([direction, values], cls=CursorEncoder)
+        return base64.urlsafe_b64encode(
+            payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        if not cursor:
+            return FORWARD, None
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            direction, values = json.loads(
+                base64.urlsafe_b64decode(padded.encode()))
+            if direction not in (FORWARD, BACKWARD):
+                raise ValueError(direction)
+            if len(values) != len(self.ordering):
+                raise ValueError(values)
+            model = self.object_list.model
+            position = tuple(
+                _position_value(_model_field(model, field.lstrip('-')), value)
+                for field, value in zip(self.ordering, values)
+            )
+        except (binascii.Error, ValueError, TypeError, ValidationError):
+            return FORWARD, None
+        return direction, position
+
+    def cache_key(self, cursor):
+        """Ключ кеша страницы по разобранному курсору.
+
+        Строится не из строки запроса: все битые курсоры дают ключ первой
+        страницы, а длина ключа не зависит от ввода.
+        """
+        direction, position = self.decode_cursor(cursor)
+        payload = json.dumps([direction, position], cls=CursorEncoder)
+        return hashlib.md5(payload.encode()).hexdigest()
+
+    @staticmethod
+    def _after(ordering, position):
+        """Условие "строго после позиции" для составного ключа."""
+        condition = Q()
+        for index, field in enumerate(ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            step = Q(**{f'{name}__{lookup}': position[index]})
+            for prev_field, value in zip(ordering[:index], position):
+                step &= Q(**{prev_field.lstrip('-'): value})
+            condition |= step
+        # Нестрогая граница по первому полю не меняет выборку, но даёт
+        # СУБД искать по диапазону индекса, а не сканировать его с начала
+        first = ordering[0]
+        lookup = 'lte' if first.startswith('-') else 'gte'
+        return Q(**{f'{first.lstrip("-")}__{lookup}': position[0]}) & condition
+
+
+class MergedCursorPaginator(CursorPaginator):
+    """CursorPaginator по нескольким источникам с общим ключом, например
+    по таблице постов и архиву.
+
+    Каждый источник отдаёт не больше per_page + 1 строк после курсора по
+    своему индексу, строки сливаются по ключу. Все поля ключа должны
+    сортироваться в одну сторону.
+    """
+
+    def __init__(self, sources, per_page, ordering=('-pub_date', '-pk')):
+        super().__init__(sources[0], per_page, ordering)
+        self.sources = tuple(sources)
+        if len({field.startswith('-') for field in self.ordering}) > 1:
+            raise ValueError('Поля ключа сортируются в разные стороны')
+
+    def _rows(self, ordering, position, limit):
+        names = [field.lstrip('-') for field in ordering]
+        merged = heapq.merge(
+            *(
+                _rows_after(source, ordering, position, limit)
+                for source in self.sources
+            ),
+            key=lambda row: [_value(row, name) for name in names],
+            reverse=ordering[0].startswith('-')
+        )
+        return list(itertools.islice(merged, limit))
+
+
+def _rows_after(queryset, ordering, position, limit):
+    queryset = queryset.order_by(*ordering)
+    if position is not None:
+        queryset = queryset.filter(CursorPaginator._after(ordering, position))
+    return list(queryset[:limit])
+
+
+def _reverse(field):
+    return field[1:] if field.startswith('-') else '-' + field
+
+
+def _model_field(model, name):
+    if name == 'pk':
+        return model._meta.pk
+    return model._meta.get_field(name)
+
+
+def _position_value(field, value):
+    """Значение ключа из курсора; ValueError, если по нему нельзя
+    фильтровать."""
+    value = field.to_python(value)
+    if value is None:
+        raise ValueError('Пустое значение ключа')
+    if isinstance(value, int) and not MIN_INTEGER <= value <= MAX_INTEGER:
+        raise ValueError(value)
+    return value
+
+
+def _value(row, name):
+    if isinstance(row, dict):
+        if name == 'pk' and 'pk' not in row:
+            return row['id']
+        return row[name]
+    return getattr(row, name)
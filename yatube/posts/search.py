@@ -0,0 +1,150 @@
+"""Полнотекстовый поиск по постам на SQLite FTS5.
+
+Индекс - отдельная виртуальная таблица, где rowid совпадает с id поста.
+Сигналы модели Post поддерживают её в актуальном состоянии, команда
+rebuild_search_index пересобирает индекс целиком. На других СУБД поиск
+откатывается к ``icontains``.
+"""
+import re
+
+from django.db import connection
+
+from .models import Post
+
+FTS_TABLE = 'posts_post_fts'
+TOKEN_RE = re.compile(r'\w+')
+
+
+def is_available():
+    return connection.vendor == 'sqlite'
+
+
+def build_match(query):
+    """Строка MATCH из слов запроса: все слова обязательны, последнее -
+    префикс. Кавычки не дают пользователю сломать синтаксис FTS5."""
+    tokens = TOKEN_RE.findall(query)
+    if not tokens:
+        return ''
+    terms = [f'"{token}"' for token in tokens]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def index_post(post_id, text):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id])
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE}(rowid, text) VALUES (%s, %s)',
+            [post_id, text]
+        )
+
+
+def unindex_post(post_id):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id])
+
+
+def unindex_posts(post_ids):
+    if not post_ids:
+        return
+    placeholders = ', '.join(['%s'] * len(post_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})',
+            list(post_ids)
+        )
+
+
+def index_after(last_pk):
+    """Индексирует посты с id больше last_pk, например после bulk_create."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE}(rowid, text) '
+            f'SELECT id, text FROM {Post._meta.db_table} WHERE id > %s '
+            f'AND id NOT IN (SELECT rowid FROM {FTS_TABLE} WHERE rowid > %s)',
+            [last_pk, last_pk]
+        )
+
+
+def rebuild():
+    """Пересобирает индекс одним INSERT ... SELECT внутри SQLite."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE}(rowid, text) '
+            f'SELECT id, text FROM {Post._meta.db_table}'
+        )
+        cursor.execute(f'SELECT count(*) FROM {FTS_TABLE}')
+        return cursor.fetchone()[0]
+
+
+def filter_queryset(queryset, query):
+    """Ограничивает выборку постами, найденными по индексу."""
+    match = build_match(query)
+    if not is_available():
+        return queryset.filter(text__icontains=query)
+    if not match:
+        return queryset.none()
+    # extra(), а не pk__in=RawSQL(...): Django оборачивает RawSQL во
+    # вторые скобки, и SQLite берёт из подзапроса только первую строку
+    table = queryset.model._meta.db_table
+    return queryset.extra(
+        where=[
+            f'"{table}"."id" IN (SELECT rowid FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s)'
+        ],
+        params=[match]
+    )
+
+
+class SearchResults:
+    """Результаты поиска, упорядоченные по релевантности (bm25).
+
+    Поддерживает count() и срезы, поэтому отдаётся прямо в Paginator:
+    каждая страница - один запрос к индексу с LIMIT/OFFSET и один
+    запрос постов по списку id.
+    """
+
+    def __init__(self, query):
+        self.query = query
+        self.match = build_match(query)
+
+    def count(self):
+        if not is_available():
+            return self._fallback().count()
+        if not self.match:
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT count(*) FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s',
+                [self.match]
+            )
+            return cursor.fetchone()[0]
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        if not is_available():
+            return list(self._fallback()[index])
+        if not self.match:
+            return []
+        offset = index.start or 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s ORDER BY rank '
+                f'LIMIT %s OFFSET %s',
+                [self.match, index.stop - offset, offset]
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+        posts = Post.objects.for_feed().in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
+
+    def _fallback(self):
+        return Post.objects.for_feed().filter(text__icontains=self.query)
@@ -0,0 +1,175 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from core.tasks import enqueue
+
+from . import authors, groups, search, timeline
+from .cache import (USERS, author_feed, bump_feed_versions, group_feed,
+                    post_feeds)
+from .models import (ArchivedPost, AuthorStats, Follow, Group, Post,
+                     User)
+from .tasks import (backfill_followers, backfill_timeline, delete_image,
+                    fan_out_post, generate_thumbnails, sync_search)
+
+# Поля пользователя, которые ленты показывают у его постов
+DISPLAY_FIELDS = ('username', 'first_name', 'last_name')
+
+
+@receiver(post_init, sender=Post)
+def remember_group(sender, instance, **kwargs):
+    # Запоминаем исходную группу: при переносе поста нужно сбросить
+    # кеш и старой группы. Отложенное поле не трогаем, чтобы не
+    # вызвать лишний запрос.
+    instance._initial_group_id = instance.__dict__.get('group_id')
+
+
+@receiver(post_init, sender=Post)
+def remember_image(sender, instance, **kwargs):
+    # Исходное имя картинки: миниатюры нужны только новой, а старая
+    # удаляется после замены. Из БД приходит строка, а загруженный
+    # файл нового поста ещё не лежит в хранилище.
+    image = instance.__dict__.get('image')
+    instance._initial_image = image if isinstance(image, str) else ''
+
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        AuthorStats.change_posts_count(instance.author_id, 1)
+        # Раскладка стоит столько, сколько у автора подписчиков, поэтому
+        # в запросе только ставим задачу
+        enqueue(fan_out_post, instance.pk, key=f'fan_out:{instance.pk}')
+
+
+@receiver(post_save, sender=Post)
+def post_saved_bump_feeds(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    feeds = post_feeds(instance)
+    initial_group_id = getattr(instance, '_initial_group_id', None)
+    if initial_group_id:
+        feeds.append(group_feed(initial_group_id))
+    bump_feed_versions(feeds)
+    instance._initial_group_id = instance.group_id
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    AuthorStats.change_posts_count(instance.author_id, -1)
+    bump_feed_versions(post_feeds(instance))
+
+
+@receiver(post_delete, sender=ArchivedPost)
+def archived_post_deleted(sender, instance, **kwargs):
+    AuthorStats.change_posts_count(instance.author_id, -1)
+    bump_feed_versions([author_feed(instance.author_id)])
+
+
+@receiver(post_save, sender=Post)
+def post_saved_index(sender, instance, raw=False, **kwargs):
+    if not raw and search.is_available():
+        enqueue(sync_search, instance.pk, key=f'search:{instance.pk}')
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted_unindex(sender, instance, **kwargs):
+    if search.is_available():
+        enqueue(sync_search, instance.pk, key=f'search:{instance.pk}')
+
+
+def schedule_image_deletion(name):
+    if name:
+        enqueue(delete_image, name, key=f'delete_image:{name}')
+
+
+@receiver(post_save, sender=Post)
+def post_saved_thumbnails(sender, instance, raw=False, **kwargs):
+    # Отложенное поле не загружено, а значит, и не менялось
+    if raw or 'image' not in instance.__dict__:
+        return
+    name = instance.image.name or ''
+    if name == instance._initial_image:
+        return
+    # Миниатюры готовит фоновая задача, запрос их не ждёт
+    if name:
+        enqueue(generate_thumbnails, instance.pk,
+                key=f'thumbnails:{instance.pk}')
+    schedule_image_deletion(instance._initial_image)
+    instance._initial_image = name
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted_image(sender, instance, **kwargs):
+    schedule_image_deletion(instance.image.name)
+
+
+@receiver(post_delete, sender=ArchivedPost)
+def archived_post_deleted_image(sender, instance, **kwargs):
+    schedule_image_deletion(instance.image)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, raw=False, **kwargs):
+    if not created or raw:
+        return
+    AuthorStats.change_followers_count(instance.author_id, 1)
+    enqueue(backfill_timeline, instance.user_id, instance.author_id,
+            key=f'backfill:{instance.user_id}:{instance.author_id}')
+    # Кнопка подписки на странице автора входит в её ETag
+    bump_feed_versions([author_feed(instance.author_id)])
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    AuthorStats.change_followers_count(instance.author_id, -1)
+    timeline.remove(instance.user_id, instance.author_id)
+    followers_count = AuthorStats.objects.filter(
+        user_id=instance.author_id).values_list(
+            'followers_count', flat=True).first()
+    if followers_count == settings.FANOUT_FOLLOWERS_LIMIT:
+        # Автор снова раскладывается при записи; раскладка по всем
+        # подписчикам не для запроса отписки
+        enqueue(backfill_followers, instance.author_id,
+                key=f'backfill_followers:{instance.author_id}')
+    bump_feed_versions([author_feed(instance.author_id)])
+
+
+@receiver(post_init, sender=User)
+def remember_names(sender, instance, **kwargs):
+    instance._initial_names = display_names(instance)
+
+
+def display_names(user):
+    # Отложенные поля не трогаем, чтобы не вызвать лишний запрос
+    return tuple(user.__dict__.get(field) for field in DISPLAY_FIELDS)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    # Имя автора стоит в заголовке профиля и его ленты RSS; вход
+    # пользователя меняет только last_login
+    if update_fields != frozenset({'last_login'}):
+        bump_feed_versions([author_feed(instance.pk)])
+    names = display_names(instance)
+    if created:
+        # Новое имя могло быть закешировано как несуществующее
+        authors.invalidate()
+    elif names != instance._initial_names:
+        authors.invalidate()
+        # Имя и ссылка на профиль стоят в каждой ленте с постами автора
+        bump_feed_versions([USERS])
+    instance._initial_names = names
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    authors.invalidate()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    groups.invalidate()
+    # Название и описание стоят в странице группы и её ETag
+    bump_feed_versions([group_feed(instance.pk)])
@@ -0,0 +1,69 @@
+"""Фоновые задачи постов.
+
+Задачи получают только id поста и сами читают его текущее состояние,
+поэтому их можно повторять и выполнять в любом порядке: последняя
+выполненная приводит индекс и ленты к тому, что лежит в БД.
+"""
+from core.tasks import task
+
+from . import search, thumbnails, timeline
+from .cache import bump_feed_versions, post_feeds
+from .models import ArchivedPost, Follow, Post
+
+
+@task
+def fan_out_post(post_id):
+    """Раскладывает пост по лентам подписчиков."""
+    row = Post.objects.filter(pk=post_id).values_list(
+        'pk', 'author_id', 'pub_date').first()
+    # Пост успели удалить - его записи лент удалились вместе с ним
+    if row is not None:
+        timeline.fan_out([row])
+
+
+@task
+def backfill_timeline(user_id, author_id):
+    """Добавляет в ленту подписчика свежие посты автора."""
+    # Успели отписаться - лента уже очищена
+    if Follow.objects.filter(user_id=user_id, author_id=author_id).exists():
+        timeline.backfill(user_id, author_id)
+
+
+@task
+def backfill_followers(author_id):
+    """Раскладывает свежие посты автора всем подписчикам."""
+    timeline.backfill_followers(author_id)
+
+
+@task
+def sync_search(post_id):
+    """Приводит запись поиска к текущему тексту поста."""
+    text = Post.objects.filter(pk=post_id).values_list(
+        'text', flat=True).first()
+    if text is None:
+        search.unindex_post(post_id)
+    else:
+        search.index_post(post_id, text)
+
+
+@task
+def generate_thumbnails(post_id):
+    """Готовит миниатюры текущей картинки поста."""
+    post = Post.objects.filter(pk=post_id).only(
+        'image', 'author_id', 'group_id').first()
+    if post is None or not post.image:
+        return
+    thumbnails.generate(post.image.name)
+    # Закешированные фрагменты лент показывают оригинал, пока
+    # миниатюры не готовы
+    bump_feed_versions(post_feeds(post))
+
+
+@task
+def delete_image(name):
+    """Удаляет файл картинки и её миниатюры, если на него больше не
+    ссылается ни один пост."""
+    if (Post.objects.filter(image=name).exists()
+            or ArchivedPost.objects.filter(image=name).exists()):
+        return
+    thumbnails.delete(name)
@@ -0,0 +1,24 @@
+from django import template
+
+from .. import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def prefetch_thumbnails(posts, variant):
+    """Одним запросом подгружает миниатюры варианта для постов ленты."""
+    thumbnails.prefetch(posts, variant)
+    return ''
+
+
+@register.simple_tag
+def post_thumbnail(post, variant):
+    """Готовая миниатюра картинки поста или None.
+
+    Миниатюры здесь не создаются: пока фоновая задача их не приготовила,
+    шаблон показывает оригинал.
+    """
+    if not post.image:
+        return None
+    return thumbnails.cached_thumbnail(post.image, variant)
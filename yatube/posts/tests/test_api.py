@@ -0,0 +1,125 @@
+import base64
+import json
+from http import HTTPStatus
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.queries import QueryDetectorMixin
+
+from . import _config_tests
+from .. import api
+from ..models import Group, Post, User
+
+API_INDEX = reverse('posts:api_index')
+API_GROUP = reverse('posts:api_group_list',
+                    kwargs={'slug': _config_tests.SLUG})
+API_PROFILE = reverse('posts:api_profile',
+                      kwargs={'username': _config_tests.USER_NAME})
+
+
+class ApiTests(QueryDetectorMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username=_config_tests.USER_NAME)
+        cls.group = Group.objects.create(
+            title=_config_tests.GROUP_TITLE,
+            slug=_config_tests.SLUG,
+            description=_config_tests.DESCRIPTION
+        )
+        Post.objects.bulk_create(
+            Post(text=f'{_config_tests.POST_TEXT} {i}', author=cls.author,
+                 group=cls.group if i % 2 else None)
+            for i in range(api.POSTS_ON_PAGE + 5)
+        )
+        cls.expected = list(
+            Post.objects.order_by('-pub_date', '-pk').values_list(
+                'pk', flat=True)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def walk(self, url, **params):
+        """Проходим ленту курсорами вперёд до конца."""
+        rows = []
+        cursor = ''
+        while cursor is not None:
+            data = self.client.get(url, {'cursor': cursor, **params}).json()
+            rows.extend(data['results'])
+            cursor = data['next_cursor']
+        return rows
+
+    def test_feeds_cover_posts(self):
+        """Ленты API проходятся курсором без пропусков и повторов"""
+        grouped = set(
+            Post.objects.filter(group=self.group).values_list(
+                'pk', flat=True)
+        )
+        feeds = {
+            API_INDEX: self.expected,
+            API_PROFILE: self.expected,
+            API_GROUP: [pk for pk in self.expected if pk in grouped],
+        }
+        for url, expected in feeds.items():
+            with self.subTest(url=url):
+                rows = self.walk(url)
+                self.assertEqual([row['id'] for row in rows], expected)
+
+    def test_post_fields(self):
+        """Пост отдаётся со всеми полями"""
+        post = Post.objects.filter(group=self.group).first()
+        url = reverse('posts:api_post_detail', kwargs={'post_id': post.pk})
+        self.assertEqual(self.client.get(url).json(), {
+            'id': post.pk,
+            'text': post.text,
+            'author': self.author.username,
+            'group': self.group.slug,
+            'image': None,
+            'pub_date': post.pub_date.isoformat(),
+        })
+
+    def test_fields_projection(self):
+        """fields= оставляет только нужные поля и не читает текст"""
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get(
+                API_INDEX, {'fields': 'id,author'}).json()
+        self.assertEqual(
+            set(data['results'][0]), {'id', 'author'})
+        self.assertFalse([
+            q for q in queries.captured_queries
+            if '"posts_post"."text"' in q['sql']
+        ])
+        response = self.client.get(API_INDEX, {'fields': 'id,password'})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_missing_objects_are_not_found(self):
+        """Несуществующие группа, автор и пост - 404 в JSON"""
+        urls = (
+            reverse('posts:api_group_list', kwargs={'slug': 'missing'}),
+            reverse('posts:api_profile', kwargs={'username': 'missing'}),
+            reverse('posts:api_post_detail', kwargs={'post_id': 0}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+                self.assertIn('detail', response.json())
+
+    def test_crafted_cursor_returns_first_page(self):
+        """Курсор с пустым или огромным ключом - первая страница"""
+        first = self.client.get(API_INDEX).json()['results']
+        for payload in (
+            ['n', ['2020-01-01T00:00:00+00:00', 10 ** 30]],
+            ['n', [None, None]],
+        ):
+            cursor = base64.urlsafe_b64encode(
+                json.dumps(payload).encode()).decode()
+            with self.subTest(payload=payload):
+                response = self.client.get(API_INDEX, {'cursor': cursor})
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertEqual(response.json()['results'], first)
@@ -0,0 +1,359 @@
+import csv
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from core.queries import QueryDetectorMixin
+
+from . import _config_tests
+from .. import api
+from ..models import ArchivedPost, AuthorStats, Group, Post, User
+from ..search import SearchResults
+
+RECORDS = [
+    {'text': 'Старый пост про кошку', 'author': _config_tests.USER_NAME,
+     'group': _config_tests.SLUG, 'pub_date': '2010-05-01T10:00:00+00:00'},
+    {'text': 'Пост без группы', 'author': _config_tests.USER_NAME},
+    {'text': 'Пост неизвестного автора', 'author': 'nobody'},
+    {'text': 'Пост в чужой группе', 'author': _config_tests.USER_NAME,
+     'group': 'missing'},
+    {'text': 'Последний пост', 'author': _config_tests.USER_NAME,
+     'group': _config_tests.SLUG},
+]
+
+
+class ImportPostsCommandTests(QueryDetectorMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username=_config_tests.USER_NAME)
+        cls.group = Group.objects.create(
+            title=_config_tests.GROUP_TITLE,
+            slug=_config_tests.SLUG,
+            description=_config_tests.DESCRIPTION
+        )
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def write_jsonl(self, records):
+        path = os.path.join(self.tmp.name, 'posts.jsonl')
+        with open(path, 'w', encoding='utf-8') as file:
+            for record in records:
+                file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        return path
+
+    def write_csv(self, records):
+        path = os.path.join(self.tmp.name, 'posts.csv')
+        with open(path, 'w', encoding='utf-8', newline='') as file:
+            writer = csv.DictWriter(
+                file, fieldnames=('text', 'author', 'group', 'pub_date'))
+            writer.writeheader()
+            writer.writerows(records)
+        return path
+
+    def run_import(self, path, **options):
+        out = StringIO()
+        call_command('import_posts', path, stdout=out, stderr=StringIO(),
+                     **options)
+        return out.getvalue()
+
+    def test_import_jsonl_and_csv(self):
+        # Загружаются корректные записи, битые пропускаются
+        for writer in (self.write_jsonl, self.write_csv):
+            with self.subTest(writer=writer.__name__):
+                Post.objects.all().delete()
+                output = self.run_import(writer(RECORDS), batch_size=2)
+                self.assertIn('вставлено 3, пропущено 2', output)
+                self.assertEqual(
+                    sorted(Post.objects.values_list('text', flat=True)),
+                    sorted([RECORDS[0]['text'], RECORDS[1]['text'],
+                            RECORDS[4]['text']])
+                )
+
+    def test_import_keeps_pub_date_and_side_effects(self):
+        # Сохраняется дата, счётчик автора и поисковый индекс
+        self.run_import(self.write_jsonl(RECORDS))
+        post = Post.objects.get(text=RECORDS[0]['text'])
+        self.assertEqual(post.pub_date.year, 2010)
+        self.assertEqual(post.group, self.group)
+        self.assertEqual(
+            AuthorStats.objects.get(user=self.author).posts_count, 3)
+        self.assertEqual(list(SearchResults('кошку')[:10]), [post])
+
+    def test_malformed_records_are_skipped(self):
+        # Битая строка JSON и записи неверных типов пропускаются, а
+        # загрузка идёт дальше
+        user = _config_tests.USER_NAME
+        lines = [
+            '{"text": ',
+            '[1]',
+            '"x"',
+            json.dumps({'text': 'a', 'author': user, 'pub_date': 123}),
+            json.dumps({'text': 'a', 'author': ['x']}),
+            json.dumps({'text': 'a', 'author': user, 'group': ['x']}),
+            json.dumps({'text': 5, 'author': user}),
+            json.dumps(RECORDS[4], ensure_ascii=False),
+        ]
+        path = os.path.join(self.tmp.name, 'broken.jsonl')
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write('\n'.join(lines) + '\n')
+        output = self.run_import(path, batch_size=3)
+        self.assertIn('вставлено 1, пропущено 7', output)
+        self.assertEqual(
+            list(Post.objects.values_list('text', flat=True)),
+            [RECORDS[4]['text']]
+        )
+
+    def test_import_resume_from_offset(self):
+        # --offset пропускает уже загруженные записи
+        self.run_import(self.write_jsonl(RECORDS), offset=4)
+        self.assertEqual(
+            list(Post.objects.values_list('text', flat=True)),
+            [RECORDS[4]['text']]
+        )
+
+
+class ExportPostsTests(QueryDetectorMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username=_config_tests.USER_NAME)
+        cls.group = Group.objects.create(
+            title=_config_tests.GROUP_TITLE,
+            slug=_config_tests.SLUG,
+            description=_config_tests.DESCRIPTION
+        )
+        other = User.objects.create(username=_config_tests.RANDOM_USER)
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, text=f'{_config_tests.POST_TEXT} {i}',
+                group=cls.group if i % 2 else None)
+            for i in range(5)
+        ]
+        Post.objects.create(author=other, text=_config_tests.POST_TEXT,
+                            group=cls.group)
+        cls.staff = User.objects.create(username='staff', is_staff=True)
+
+    def setUp(self):
+        self.client.force_login(self.author)
+
+    def export_rows(self):
+        response = self.client.get(reverse(
+            'posts:profile_export',
+            kwargs={'username': self.author.username}))
+        self.assertTrue(response.streaming)
+        return [
+            json.loads(line)
+            for line in b''.join(response.streaming_content).splitlines()
+        ]
+
+    def test_profile_export_streams_jsonl(self):
+        # Выгрузка автора потоковая и содержит только его посты
+        rows = self.export_rows()
+        self.assertEqual(
+            [row['id'] for row in rows], [post.pk for post in self.posts])
+        self.assertEqual(rows[1]['group'], self.group.slug)
+        self.assertEqual(rows[0]['author'], self.author.username)
+
+    def test_profile_export_includes_archive(self):
+        # Архивные посты выгружаются вместе с остальными по порядку id
+        Post.objects.filter(pk=self.posts[1].pk).update(
+            pub_date=timezone.now() - timedelta(days=400))
+        call_command('archive_posts', stdout=StringIO())
+        self.assertTrue(ArchivedPost.objects.exists())
+        rows = self.export_rows()
+        self.assertEqual(
+            [row['id'] for row in rows], [post.pk for post in self.posts])
+        self.assertEqual(rows[1]['text'], self.posts[1].text)
+
+    def test_export_is_for_owner_and_staff(self):
+        # Чужую историю выгружает только персонал, группу - тоже
+        profile = reverse('posts:profile_export',
+                          kwargs={'username': self.author.username})
+        group = reverse('posts:group_export',
+                        kwargs={'slug': self.group.slug})
+        other = User.objects.get(username=_config_tests.RANDOM_USER)
+        self.client.force_login(other)
+        for url in (profile, group):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.logout()
+        self.assertEqual(self.client.get(profile).status_code, 302)
+        self.client.force_login(self.staff)
+        for url in (profile, group):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_group_export_csv(self):
+        # Выгрузка группы в CSV с заголовком
+        self.client.force_login(self.staff)
+        response = self.client.get(
+            reverse('posts:group_export', kwargs={'slug': self.group.slug}),
+            {'format': 'csv'}
+        )
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        content = b''.join(response.streaming_content).decode()
+        rows = list(csv.DictReader(StringIO(content)))
+        self.assertEqual(len(rows), 3)
+        self.assertEqual({row['group'] for row in rows}, {self.group.slug})
+
+    def test_export_command_roundtrip(self):
+        # Выгрузка команды снова загружается командой import_posts
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'posts.jsonl')
+            call_command('export_posts', author=self.author.username,
+                         output=path, chunk_size=2, stderr=StringIO())
+            Post.objects.filter(author=self.author).delete()
+            call_command('import_posts', path, stdout=StringIO(),
+                         stderr=StringIO())
+        self.assertEqual(
+            sorted(Post.objects.filter(author=self.author).values_list(
+                'text', 'pub_date')),
+            sorted((post.text, post.pub_date) for post in self.posts)
+        )
+
+
+class ArchivePostsCommandTests(QueryDetectorMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username=_config_tests.USER_NAME)
+        cls.group = Group.objects.create(
+            title=_config_tests.GROUP_TITLE,
+            slug=_config_tests.SLUG,
+            description=_config_tests.DESCRIPTION
+        )
+
+    def setUp(self):
+        self.client.force_login(self.author)
+        self.old = Post.objects.create(
+            author=self.author, group=self.group, text='Старый пост про сову')
+        Post.objects.filter(pk=self.old.pk).update(
+            pub_date=timezone.now() - timedelta(days=400))
+        self.fresh = Post.objects.create(
+            author=self.author, group=self.group, text=_config_tests.POST_TEXT)
+
+    def archive(self, **options):
+        out = StringIO()
+        call_command('archive_posts', stdout=out, batch_size=1, **options)
+        return out.getvalue()
+
+    def test_old_posts_move_to_archive(self):
+        # Старый пост уходит из таблицы постов, лент и поиска, а счётчик
+        # автора не меняется
+        self.assertIn('постов: 1', self.archive())
+        self.assertEqual(list(Post.objects.all()), [self.fresh])
+        archived = ArchivedPost.objects.get()
+        self.assertEqual(
+            (archived.pk, archived.text, archived.group_id),
+            (self.old.pk, self.old.text, self.group.pk)
+        )
+        self.assertEqual(
+            AuthorStats.objects.get(user=self.author).posts_count, 2)
+        self.assertEqual(list(SearchResults('сову')[:10]), [])
+        response = self.client.get(reverse('posts:index'))
+        self.assertEqual(
+            list(response.context['page_obj'].object_list), [self.fresh])
+        # Повторный запуск ничего не переносит
+        self.assertIn('постов: 0', self.archive())
+
+    def test_dry_run_changes_nothing(self):
+        self.assertIn('попадут постов: 1', self.archive(dry_run=True))
+        self.assertFalse(ArchivedPost.objects.exists())
+
+    def test_archived_post_pages(self):
+        # Страница поста и профиль продолжаются в архиве, редактировать
+        # архивный пост нельзя
+        self.archive()
+        response = self.client.get(
+            reverse('posts:post_detail', args=(self.old.pk,)))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['post'].text, self.old.text)
+        self.assertNotContains(
+            response, reverse('posts:post_edit', args=(self.old.pk,)))
+        response = self.client.get(
+            reverse('posts:profile', args=(self.author.username,)))
+        self.assertEqual(
+            [post.pk for post in response.context['page_obj']],
+            [self.fresh.pk, self.old.pk]
+        )
+        self.assertEqual(response.context['posts_count'], 2)
+        response = self.client.get(
+            reverse('posts:api_post_detail', args=(self.old.pk,)))
+        self.assertEqual(response.json()['text'], self.old.text)
+
+    def test_profile_merges_archive_by_date(self):
+        # Импортированный пост старше архивного, хотя лежит в таблице
+        self.archive()
+        imported = Post.objects.create(
+            author=self.author, text=_config_tests.POST_TEXT)
+        Post.objects.filter(pk=imported.pk).update(
+            pub_date=timezone.now() - timedelta(days=500))
+        response = self.client.get(
+            reverse('posts:profile', args=(self.author.username,)))
+        self.assertEqual(
+            [post.pk for post in response.context['page_obj']],
+            [self.fresh.pk, self.old.pk, imported.pk]
+        )
+
+    def test_profile_cursor_includes_archive(self):
+        # Курсор HTML-профиля и API листает и архив, по дате
+        self.archive()
+        imported = Post.objects.create(
+            author=self.author, text=_config_tests.POST_TEXT)
+        Post.objects.filter(pk=imported.pk).update(
+            pub_date=timezone.now() - timedelta(days=500))
+        expected = [self.fresh.pk, self.old.pk, imported.pk]
+        response = self.client.get(
+            reverse('posts:profile', args=(self.author.username,)),
+            {'cursor': ''})
+        self.assertEqual(
+            [post.pk for post in response.context['page_obj']], expected)
+        self.assertContains(response, self.old.text)
+        response = self.client.get(
+            reverse('posts:api_profile', args=(self.author.username,)))
+        self.assertEqual(
+            [row['id'] for row in response.json()['results']], expected)
+
+    @mock.patch.object(api, 'POSTS_ON_PAGE', 1)
+    def test_profile_cursor_pages_through_archive(self):
+        self.archive()
+        url = reverse('posts:api_profile', args=(self.author.username,))
+        seen, cursor = [], ''
+        for _ in range(3):
+            data = self.client.get(
+                url, {'cursor': cursor, 'fields': 'id'}).json()
+            seen += [row['id'] for row in data['results']]
+            if data['next_cursor'] is None:
+                break
+            cursor = data['next_cursor']
+        self.assertEqual(seen, [self.fresh.pk, self.old.pk])
+        data = self.client.get(
+            url, {'cursor': data['previous_cursor'], 'fields': 'id'}).json()
+        self.assertEqual(
+            [row['id'] for row in data['results']], [self.fresh.pk])
+
+    def test_archived_post_has_etag(self):
+        self.archive()
+        url = reverse('posts:post_detail', args=(self.old.pk,))
+        response = self.client.get(url)
+        self.assertTrue(response.has_header('ETag'))
+        response = self.client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_reconcile_counts_archived_posts(self):
+        self.archive()
+        out = StringIO()
+        call_command('reconcile_post_counts', stdout=out)
+        self.assertIn('Расхождений: 0', out.getvalue())
@@ -0,0 +1,81 @@
+from http import HTTPStatus
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.queries import QueryDetectorMixin
+
+from . import _config_tests
+from ..models import Group, Post, User
+
+GROUP_KWARGS = {'slug': _config_tests.SLUG}
+PROFILE_KWARGS = {'username': _config_tests.USER_NAME}
+FEEDS = (
+    ('posts:index_rss', {}),
+    ('posts:index_atom', {}),
+    ('posts:group_rss', GROUP_KWARGS),
+    ('posts:group_atom', GROUP_KWARGS),
+    ('posts:profile_rss', PROFILE_KWARGS),
+    ('posts:profile_atom', PROFILE_KWARGS),
+)
+
+
+class SyndicationFeedTests(QueryDetectorMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username=_config_tests.USER_NAME)
+        cls.group = Group.objects.create(
+            title=_config_tests.GROUP_TITLE,
+            slug=_config_tests.SLUG,
+            description=_config_tests.DESCRIPTION
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text=_config_tests.POST_TEXT)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feeds_list_posts(self):
+        """Ленты отдают XML нужного формата со ссылкой на пост"""
+        post_url = reverse('posts:post_detail', args=(self.post.pk,))
+        for name, kwargs in FEEDS:
+            with self.subTest(name=name):
+                response = self.client.get(reverse(name, kwargs=kwargs))
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                kind = 'atom' if name.endswith('atom') else 'rss'
+                self.assertIn(kind, response['Content-Type'])
+                self.assertContains(response, post_url)
+                self.assertContains(response, _config_tests.GROUP_TITLE)
+
+    def test_unknown_feed_object_returns_404(self):
+        for name, kwargs in (
+            ('posts:group_rss', {'slug': 'missing'}),
+            ('posts:profile_atom', {'username': 'nobody'}),
+        ):
+            with self.subTest(name=name):
+                response = self.client.get(reverse(name, kwargs=kwargs))
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_cached_until_feed_changes(self):
+        """Повторный опрос - ответ из кеша или 304, новый пост
+        обновляет ленту"""
+        url = reverse('posts:group_rss', kwargs=GROUP_KWARGS)
+        response = self.client.get(url)
+        etag = response['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url).content, response.content)
+        self.assertFalse([
+            query for query in queries
+            if 'posts_post' in query['sql']
+        ])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        Post.objects.create(
+            author=self.author, group=self.group, text='Свежий пост')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertContains(response, 'Свежий пост')
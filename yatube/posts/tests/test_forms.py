@@ -1,13 +1,32 @@
+import shutil
+import tempfile
+from unittest import mock
+
 from . import _config_tests
 from http import HTTPStatus
-from django.test import Client, TestCase
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.models import KVStore
+
+from core.models import Task
+from core.queries import QueryDetectorMixin
+from core.testing import OnCommitMixin
+from posts import thumbnails
 from posts.models import Group, Post, User
+from posts.tasks import generate_thumbnails
 PROFILE = reverse('posts:profile',
                   kwargs={'username': _config_tests.USER_NAME})
 
 
-class PostsPagesTests(TestCase):
+class PostsPagesTests(QueryDetectorMixin, TestCase):
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
@@ -104,3 +123,157 @@ class PostsPagesTests(TestCase):
         self.assertEqual(edit_post.author, self.post.author)
         self.assertNotEqual(edit_post.text, form_data_test['text'])
         self.assertEqual(edit_post.group.pk, self.group.pk)
+
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, TASKS_EAGER=True)
+class PostImageTests(OnCommitMixin, QueryDetectorMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username=_config_tests.USER_NAME)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.author)
+
+    @staticmethod
+    def upload(name='small.gif', content=SMALL_GIF):
+        return SimpleUploadedFile(name, content, content_type='image/gif')
+
+    def create_post(self, name):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Post.objects.create(
+                author=self.author,
+                text=_config_tests.POST_TEXT,
+                image=self.upload(name)
+            )
+
+    def assertFilesDeleted(self, name, thumbnail_names):
+        for file_name in (name, *thumbnail_names):
+            with self.subTest(file=file_name):
+                self.assertFalse(default_storage.exists(file_name))
+        self.assertIsNone(thumbnails.cached_thumbnail(
+            ImageFile(name), 'feed'))
+
+    def test_create_post_with_image(self):
+        """Пост с картинкой сохраняется, миниатюры ставятся в очередь
+        после фиксации транзакции"""
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.authorized_client.post(
+                reverse('posts:post_create'),
+                data={'text': _config_tests.POST_TEXT, 'image': self.upload()}
+            )
+        post = Post.objects.get()
+        self.assertEqual(post.image.name, 'posts/small.gif')
+        self.assertIsNone(thumbnails.cached_thumbnail(post.image, 'feed'))
+        with override_settings(TASKS_EAGER=False):
+            for callback in callbacks:
+                callback()
+        self.assertTrue(Task.objects.filter(
+            name=generate_thumbnails.task_name,
+            key=f'thumbnails:{post.pk}'
+        ).exists())
+
+    def test_thumbnails_are_generated_on_save(self):
+        """После сохранения поста миниатюры готовы и видны в ленте"""
+        post = self.create_post('generated.gif')
+        for variant in thumbnails.VARIANTS:
+            with self.subTest(variant=variant):
+                self.assertIsNotNone(
+                    thumbnails.cached_thumbnail(post.image, variant))
+        feed_thumbnail = thumbnails.cached_thumbnail(post.image, 'feed')
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, feed_thumbnail.url)
+
+    def test_resave_does_not_schedule_thumbnails(self):
+        """Сохранение поста без новой картинки не ставит задач"""
+        post = self.create_post('kept.gif')
+        post.text = 'Новый текст'
+        with self.captureOnCommitCallbacks() as callbacks:
+            post.save()
+        with mock.patch.object(thumbnails, 'generate') as generate, \
+                mock.patch.object(thumbnails, 'delete') as delete:
+            for callback in callbacks:
+                callback()
+        generate.assert_not_called()
+        delete.assert_not_called()
+
+    def test_replaced_image_is_deleted(self):
+        """Заменённая картинка удаляется вместе с миниатюрами"""
+        post = self.create_post('old.gif')
+        old_name = post.image.name
+        old_thumbnails = [
+            thumbnails.cached_thumbnail(post.image, variant).name
+            for variant in thumbnails.VARIANTS
+        ]
+        post.image = self.upload('new.gif')
+        with self.captureOnCommitCallbacks(execute=True):
+            post.save()
+        self.assertFilesDeleted(old_name, old_thumbnails)
+        self.assertTrue(default_storage.exists(post.image.name))
+        self.assertIsNotNone(thumbnails.cached_thumbnail(post.image, 'feed'))
+
+    def test_deleted_post_image_is_deleted(self):
+        """Картинка удалённого поста удаляется вместе с миниатюрами"""
+        post = self.create_post('deleted.gif')
+        name = post.image.name
+        old_thumbnails = [
+            thumbnails.cached_thumbnail(post.image, variant).name
+            for variant in thumbnails.VARIANTS
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            post.delete()
+        self.assertFilesDeleted(name, old_thumbnails)
+
+    @override_settings(POST_IMAGE_MAX_SIZE=10)
+    def test_large_image_is_rejected(self):
+        """Картинка больше POST_IMAGE_MAX_SIZE не принимается"""
+        response = self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': _config_tests.POST_TEXT, 'image': self.upload()}
+        )
+        self.assertFormError(
+            response, 'form', 'image', 'Картинка больше 10\xa0байт')
+        self.assertFalse(Post.objects.exists())
+
+    def test_feed_does_not_generate_thumbnails(self):
+        """Лента без готовых миниатюр показывает оригинал и не ресайзит
+        картинку в запросе"""
+        with mock.patch.object(thumbnails, 'generate'):
+            post = self.create_post('queued.gif')
+        with mock.patch.object(thumbnails, 'generate') as generate:
+            response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, post.image.url)
+        generate.assert_not_called()
+        self.assertIsNone(thumbnails.cached_thumbnail(post.image, 'feed'))
+
+    def test_feed_prefetches_thumbnails(self):
+        """Миниатюры страницы ленты читаются одним запросом к хранилищу"""
+        for number in range(3):
+            self.create_post(f'prefetch{number}.gif')
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:index'))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        kvstore_queries = [
+            query for query in queries.captured_queries
+            if KVStore._meta.db_table in query['sql']
+        ]
+        self.assertEqual(len(kvstore_queries), 1)
@@ -1,9 +1,15 @@
+from io import StringIO
+
 from . import _config_tests
+from django.core.management import call_command
 from django.test import TestCase
-from ..models import Group, Post, User
+from django.urls import reverse
+
+from core.queries import QueryDetectorMixin
+from ..models import AuthorStats, Group, Post, User
 
 
-class PostModelTest(TestCase):
+class PostModelTest(QueryDetectorMixin, TestCase):
     @classmethod
     def setUpClass(cls) -> None:
         super().setUpClass()
@@ -65,3 +71,54 @@ class PostModelTest(TestCase):
         for expected, value in field_string.items():
             with self.subTest(value=value):
                 self.assertEqual(expected, value)
+
+
+class AuthorStatsTest(QueryDetectorMixin, TestCase):
+    def setUp(self):
+        self.author = User.objects.create(
+            username=_config_tests.USER_NAME
+        )
+
+    def posts_count(self):
+        return AuthorStats.objects.get(user=self.author).posts_count
+
+    def test_posts_count_follows_create_and_delete(self):
+        # Счётчик растёт при создании поста и уменьшается при удалении
+        posts = [
+            Post.objects.create(author=self.author, text=str(i))
+            for i in range(3)
+        ]
+        self.assertEqual(self.posts_count(), 3)
+        posts[0].delete()
+        self.assertEqual(self.posts_count(), 2)
+
+    def test_author_delete_with_posts(self):
+        # Каскадное удаление автора не ломается на счётчике
+        Post.objects.create(author=self.author, text=_config_tests.POST_TEXT)
+        self.author.delete()
+        self.assertFalse(AuthorStats.objects.exists())
+
+    def test_reconcile_fixes_drift(self):
+        # bulk_create обходит сигналы, команда сверки чинит счётчик
+        Post.objects.create(author=self.author, text=_config_tests.POST_TEXT)
+        Post.objects.bulk_create(
+            Post(author=self.author, text=str(i)) for i in range(4)
+        )
+        self.assertEqual(self.posts_count(), 1)
+        call_command('reconcile_post_counts', stdout=StringIO())
+        self.assertEqual(self.posts_count(), 5)
+
+    def test_pages_read_counter(self):
+        # Детальная страница и профиль показывают значение счётчика
+        post = Post.objects.create(
+            author=self.author, text=_config_tests.POST_TEXT)
+        AuthorStats.objects.filter(user=self.author).update(posts_count=42)
+        urls = (
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}),
+            reverse('posts:profile',
+                    kwargs={'username': self.author.username}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.context['posts_count'], 42)
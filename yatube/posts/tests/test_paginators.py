@@ -0,0 +1,129 @@
+from django.contrib.admin.sites import site
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.queries import QueryDetectorMixin
+
+from . import _config_tests
+from ..cache import INDEX_FEED
+from ..models import Post, User
+from ..paginators import CachedCountPaginator, ElidedPaginator
+
+INDEX = reverse('posts:index')
+PROFILE = reverse('posts:profile',
+                  kwargs={'username': _config_tests.USER_NAME})
+
+
+def count_queries(queries):
+    return [q for q in queries.captured_queries if 'COUNT(' in q['sql']]
+
+
+class CachedCountPaginatorTests(QueryDetectorMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username=_config_tests.USER_NAME)
+
+    def setUp(self):
+        cache.clear()
+        for i in range(12):
+            Post.objects.create(author=self.author, text=str(i))
+
+    def test_count_is_cached(self):
+        """Повторный запрос ленты не выполняет COUNT(*)"""
+        for url in (INDEX, PROFILE):
+            with self.subTest(url=url):
+                self.client.get(url)
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url)
+                self.assertFalse(count_queries(queries))
+                self.assertEqual(
+                    response.context['page_obj'].paginator.count, 12)
+
+    def test_count_follows_create_and_delete(self):
+        """Создание и удаление поста обновляют закешированный счётчик"""
+        def index_count():
+            return CachedCountPaginator(
+                Post.objects.all(), 10, feed=INDEX_FEED).count
+
+        self.assertEqual(index_count(), 12)
+        post = Post.objects.create(author=self.author, text='new')
+        self.assertEqual(index_count(), 13)
+        post.delete()
+        self.assertEqual(index_count(), 12)
+
+    def test_queryset_key_without_feed(self):
+        """Без ленты разные выборки считаются отдельно"""
+        everything = CachedCountPaginator(Post.objects.all(), 10)
+        filtered = CachedCountPaginator(
+            Post.objects.filter(text__in=['1', '2']), 10)
+        self.assertEqual(everything.count, 12)
+        self.assertEqual(filtered.count, 2)
+
+    @override_settings(APPROXIMATE_COUNT_LIMIT=5)
+    def test_approximate_count_is_bounded(self):
+        """Приблизительный счётчик не считает дальше лимита"""
+        paginator = CachedCountPaginator(
+            Post.objects.all(), 2, feed=INDEX_FEED, approximate=True)
+        self.assertEqual(paginator.count, 5)
+        self.assertFalse(paginator.count_is_exact)
+        self.assertEqual(paginator.num_pages, 3)
+
+    @override_settings(APPROXIMATE_COUNT_LIMIT=11)
+    def test_approximate_feed_continues_with_cursor(self):
+        """За лимитом счётчика нет ссылки на последнюю страницу, а
+        лента продолжается курсором"""
+        response = self.client.get(INDEX)
+        page_obj = response.context['page_obj']
+        self.assertFalse(page_obj.count_is_exact)
+        self.assertEqual(
+            page_obj.elided_page_range, [1, 2, ElidedPaginator.ELLIPSIS])
+        self.assertNotContains(response, 'Последняя')
+        response = self.client.get(INDEX, {'page': 2})
+        cursor = response.context['page_obj'].continuation_cursor
+        self.assertContains(response, f'?cursor={cursor}')
+        response = self.client.get(INDEX, {'cursor': cursor})
+        self.assertEqual(
+            [post.text for post in response.context['page_obj']], ['0'])
+
+    def test_admin_uses_cached_paginator(self):
+        """Админка постов использует кеширующий Paginator"""
+        admin_model = site._registry[Post]
+        self.assertIs(admin_model.paginator, CachedCountPaginator)
+        self.assertFalse(admin_model.show_full_result_count)
+
+
+class ElidedPaginatorTests(QueryDetectorMixin, TestCase):
+    def test_elided_page_range(self):
+        """Навигация - края и окно вокруг текущей страницы"""
+        paginator = ElidedPaginator(range(1000), 10)
+        ellipsis = ElidedPaginator.ELLIPSIS
+        cases = {
+            1: [1, 2, 3, 4, ellipsis, 100],
+            50: [1, ellipsis, 47, 48, 49, 50, 51, 52, 53, ellipsis, 100],
+            100: [1, ellipsis, 97, 98, 99, 100],
+        }
+        for number, expected in cases.items():
+            with self.subTest(number=number):
+                page = paginator.get_page(number)
+                self.assertEqual(page.elided_page_range, expected)
+
+    def test_short_range_is_not_elided(self):
+        """Короткая лента показывает все страницы"""
+        page = ElidedPaginator(range(50), 10).get_page(3)
+        self.assertEqual(page.elided_page_range, [1, 2, 3, 4, 5])
+
+    def test_feed_navigation_size_is_constant(self):
+        """Число ссылок в навигации ленты не растёт с числом постов"""
+        cache.clear()
+        author = User.objects.create(username=_config_tests.USER_NAME)
+        Post.objects.bulk_create(
+            Post(author=author, text=str(i)) for i in range(500))
+        response = self.client.get(INDEX, {'page': 25})
+        page_obj = response.context['page_obj']
+        self.assertEqual(len(page_obj.elided_page_range), 11)
+        self.assertNotContains(response, '?page=30"')
+        self.assertContains(response, '?page=28"')
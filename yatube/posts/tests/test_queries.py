@@ -0,0 +1,127 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.queries import QueryDetectorMixin
+
+from . import _config_tests
+from ..groups import registry
+from ..models import Follow, Group, Post, User
+from ..urls import urlpatterns
+
+# Бюджет SQL-запросов на страницу для авторизованного пользователя:
+# в каждый бюджет входят два запроса сессии и пользователя, а в бюджеты
+# группы, профиля и поста - ещё запрос для ETag, а в бюджеты профиля -
+# запрос к архиву автора. Ленты RSS и Atom не читают сессию: у них
+# только запросы постов и автора.
+QUERY_BUDGETS = {
+    'posts:index': 4,
+    'posts:group_index': 3,
+    'posts:group_list': 4,
+    'posts:group_export': 4,
+    'posts:profile': 7,
+    'posts:profile_export': 4,
+    'posts:post_detail': 4,
+    'posts:search': 2,
+    'posts:post_create': 3,
+    'posts:post_edit': 5,
+    'posts:follow_index': 6,
+    'posts:profile_follow': 3,
+    'posts:profile_unfollow': 4,
+    'posts:api_index': 3,
+    'posts:api_post_detail': 4,
+    'posts:api_group_list': 3,
+    'posts:api_profile': 5,
+    'posts:index_rss': 1,
+    'posts:index_atom': 1,
+    'posts:group_rss': 1,
+    'posts:group_atom': 1,
+    'posts:profile_rss': 2,
+    'posts:profile_atom': 2,
+}
+# Во сколько шагов наращиваем данные и сколько постов добавляем за шаг
+GROWTH_STEPS = 3
+POSTS_PER_STEP = 15
+
+
+class QueryBudgetTests(QueryDetectorMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username=_config_tests.USER_NAME)
+        cls.group = Group.objects.create(
+            title=_config_tests.GROUP_TITLE,
+            slug=_config_tests.SLUG,
+            description=_config_tests.DESCRIPTION
+        )
+        cls.post = Post.objects.create(
+            author=cls.author,
+            text=_config_tests.POST_TEXT,
+            group=cls.group
+        )
+        followed = User.objects.create(username='followed')
+        Follow.objects.create(user=cls.author, author=followed)
+        Post.objects.create(author=followed, text=_config_tests.POST_TEXT)
+        cls.kwargs = {
+            'slug': cls.group.slug,
+            'username': cls.author.username,
+            'post_id': cls.post.pk,
+        }
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.author)
+
+    def grow(self, step):
+        """Добавляем посты разных авторов и групп в те же ленты."""
+        for i in range(POSTS_PER_STEP):
+            user = User.objects.create(username=f'user_{step}_{i}')
+            group = Group.objects.create(
+                title=f'group {step} {i}',
+                slug=f'group_{step}_{i}',
+                description=_config_tests.DESCRIPTION
+            )
+            # Подписки наполняют ленту подписок автора
+            Follow.objects.create(user=self.author, author=user)
+            Post.objects.create(
+                author=user, text=_config_tests.POST_TEXT, group=group)
+            Post.objects.create(
+                author=self.author,
+                text=_config_tests.POST_TEXT,
+                group=self.group if i % 2 else group
+            )
+
+    def count_queries(self, url):
+        # Меряем холодный путь: без закешированных фрагментов лент, но
+        # со снимком групп - он живёт весь процесс, а не одну версию ленты
+        cache.clear()
+        registry.by_id()
+        with CaptureQueriesContext(connection) as queries:
+            self.authorized_client.get(url)
+        return len(queries)
+
+    def test_every_url_has_budget(self):
+        """У каждого URL приложения posts задан бюджет запросов"""
+        for pattern in urlpatterns:
+            with self.subTest(name=pattern.name):
+                self.assertIn(f'posts:{pattern.name}', QUERY_BUDGETS)
+
+    def test_query_budget_does_not_grow_with_data(self):
+        """Число запросов в пределах бюджета и не растёт вместе с данными"""
+        urls = {}
+        for pattern in urlpatterns:
+            name = f'posts:{pattern.name}'
+            kwargs = {
+                key: self.kwargs[key] for key in pattern.pattern.converters
+            }
+            urls[name] = reverse(name, kwargs=kwargs)
+        baseline = {}
+        for step in range(GROWTH_STEPS):
+            for name, url in urls.items():
+                with self.subTest(name=name, step=step):
+                    count = self.count_queries(url)
+                    self.assertLessEqual(count, QUERY_BUDGETS[name])
+                    self.assertEqual(count, baseline.setdefault(name, count))
+            self.grow(step)
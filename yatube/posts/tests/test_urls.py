@@ -4,6 +4,8 @@ from django.contrib.auth import get_user_model
 from django.test import Client, TestCase
 from django.urls import reverse
 
+from core.queries import QueryDetectorMixin
+
 from ..models import Group, Post, User
 
 User = get_user_model()
@@ -15,7 +17,7 @@ PROFILE = reverse('posts:profile',
                   kwargs={'username': 'TestAuthor'})
 
 
-class PostURLTests(TestCase):
+class PostURLTests(QueryDetectorMixin, TestCase):
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
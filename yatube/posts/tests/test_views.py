@@ -1,9 +1,24 @@
+import base64
+import json
+import subprocess
+import sys
+from io import StringIO
+
 from . import _config_tests
 from django.conf import settings
+from django.core.management import call_command
 from django import forms
-from django.test import Client, TestCase
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from ..models import Group, Post, User
+
+from core.queries import QueryDetectorMixin
+from core.testing import OnCommitMixin
+from .. import authors, groups
+from ..cache import INDEX_FEED, get_feed_version
+from ..models import AuthorStats, Follow, Group, Post, TimelineEntry, User
 
 
 INDEX = reverse('posts:index')
@@ -12,9 +27,15 @@ GROUP = reverse('posts:group_list',
                 kwargs={'slug': _config_tests.SLUG})
 PROFILE = reverse('posts:profile',
                   kwargs={'username': _config_tests.USER_NAME})
+FOLLOW_INDEX = reverse('posts:follow_index')
+GROUP_INDEX = reverse('posts:group_index')
+FOLLOW = reverse('posts:profile_follow',
+                 kwargs={'username': _config_tests.USER_NAME})
+UNFOLLOW = reverse('posts:profile_unfollow',
+                   kwargs={'username': _config_tests.USER_NAME})
 
 
-class PostsPagesTests(TestCase):
+class PostsPagesTests(QueryDetectorMixin, TestCase):
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
@@ -148,7 +169,7 @@ class PostsPagesTests(TestCase):
                 self.assertEqual(len(page_obj), 1)
 
 
-class PaginatorViewTests(TestCase):
+class PaginatorViewTests(QueryDetectorMixin, TestCase):
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
@@ -165,6 +186,11 @@ class PaginatorViewTests(TestCase):
         ) for _ in range(13))
         Post.objects.bulk_create(posts)
 
+    def setUp(self):
+        # bulk_create не вызывает сигналы и не меняет версии лент,
+        # поэтому счётчики из кеша прошлых тестов сбрасываем явно
+        cache.clear()
+
     def test_paginator_index_page(self):
         """Проверяем выведение постов на index"""
         response = self.client.get(INDEX)
@@ -176,3 +202,660 @@ class PaginatorViewTests(TestCase):
         """Проверяем выведение оставшихся постов на 2 странице"""
         response = self.client.get(INDEX + '?page=2')
         self.assertEqual(len(response.context.get('page_obj')), 3)
+
+
+class CursorPaginatorViewTests(QueryDetectorMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username=_config_tests.USER_NAME)
+        cls.group = Group.objects.create(
+            title=_config_tests.GROUP_TITLE,
+            slug=_config_tests.SLUG,
+            description=_config_tests.DESCRIPTION
+        )
+        posts = (Post(
+            text=f'{_config_tests.POST_TEXT} {i}',
+            group=cls.group,
+            author=cls.author,
+        ) for i in range(23))
+        Post.objects.bulk_create(posts)
+        cls.expected = list(
+            Post.objects.order_by('-pub_date', '-pk').values_list(
+                'pk', flat=True)
+        )
+
+    def walk(self, url):
+        """Проходим ленту курсорами вперёд до конца."""
+        pages = []
+        cursor = ''
+        while cursor is not None:
+            response = self.client.get(url, {'cursor': cursor})
+            page_obj = response.context.get('page_obj')
+            pages.append(page_obj)
+            cursor = page_obj.next_cursor
+        return pages
+
+    def test_cursor_pages_cover_feed(self):
+        """Курсоры проходят ленты без пропусков и повторов"""
+        for url in (INDEX, GROUP, PROFILE):
+            with self.subTest(url=url):
+                pages = self.walk(url)
+                self.assertEqual(
+                    [len(page) for page in pages],
+                    [settings.POSTS_ON_PAGE, settings.POSTS_ON_PAGE, 3]
+                )
+                self.assertEqual(
+                    [post.pk for page in pages for post in page],
+                    self.expected
+                )
+
+    def test_cursor_previous_page(self):
+        """Курсор назад возвращает предыдущую страницу"""
+        first, second, _ = self.walk(INDEX)
+        self.assertFalse(first.has_previous())
+        response = self.client.get(
+            INDEX, {'cursor': second.previous_cursor})
+        page_obj = response.context.get('page_obj')
+        self.assertEqual(list(page_obj), list(first))
+        self.assertTrue(page_obj.has_next())
+
+    def test_cursor_no_count_query(self):
+        """Курсорная страница не считает записи и рендерит ссылки"""
+        first = self.walk(INDEX)[0]
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(INDEX, {'cursor': first.next_cursor})
+        self.assertFalse(
+            [q for q in queries.captured_queries if 'COUNT(' in q['sql']]
+        )
+        response = self.client.get(INDEX, {'cursor': ''})
+        self.assertContains(response, f'?cursor={first.next_cursor}')
+
+    def test_broken_cursor_returns_first_page(self):
+        """Битый курсор открывает первую страницу"""
+        crafted = (
+            ['n', ['2020-01-01T00:00:00+00:00', 10 ** 30]],
+            ['n', [None, None]],
+        )
+        cursors = ['broken!'] + [
+            base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+            for payload in crafted
+        ]
+        for cursor in cursors:
+            for url in (INDEX, PROFILE):
+                with self.subTest(cursor=cursor, url=url):
+                    response = self.client.get(url, {'cursor': cursor})
+                    page_obj = response.context.get('page_obj')
+                    self.assertEqual(
+                        [post.pk for post in page_obj],
+                        self.expected[:settings.POSTS_ON_PAGE]
+                    )
+
+
+def bump_in_other_process(*feeds):
+    """Повышает версии лент так, как это сделал бы другой процесс
+    сервера."""
+    subprocess.run(
+        [sys.executable, 'manage.py', 'shell', '-c',
+         'from posts.cache import bump_feed_versions; '
+         f'bump_feed_versions({list(feeds)!r})'],
+        cwd=settings.BASE_DIR, check=True, capture_output=True
+    )
+
+
+class FeedCacheTests(QueryDetectorMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username=_config_tests.USER_NAME)
+        cls.group = Group.objects.create(
+            title=_config_tests.GROUP_TITLE,
+            slug=_config_tests.SLUG,
+            description=_config_tests.DESCRIPTION
+        )
+        cls.groupSecond = Group.objects.create(
+            title='Тестовая группа-2',
+            slug='test_slug_2',
+            description='Тестовое описание-2'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            author=self.author,
+            text=_config_tests.POST_TEXT,
+            group=self.group
+        )
+
+    def test_feed_fragment_is_cached(self):
+        """Список постов берётся из кеша, пока версия ленты не изменилась"""
+        for url in (INDEX, GROUP, PROFILE):
+            with self.subTest(url=url):
+                self.client.get(url)
+                Post.objects.filter(pk=self.post.pk).update(
+                    text=_config_tests.CHANGE_POST_TEXT)
+                response = self.client.get(url)
+                self.assertContains(response, _config_tests.POST_TEXT)
+                self.assertNotContains(
+                    response, _config_tests.CHANGE_POST_TEXT)
+                Post.objects.filter(pk=self.post.pk).update(
+                    text=_config_tests.POST_TEXT)
+
+    def test_post_edit_bumps_affected_feeds(self):
+        """Правка поста обновляет ленты поста и не трогает чужие"""
+        second_group = reverse(
+            'posts:group_list', kwargs={'slug': self.groupSecond.slug})
+        feeds = {
+            url: feed_cache_key_for(self.client, url)
+            for url in (INDEX, GROUP, PROFILE, second_group)
+        }
+        self.post.text = _config_tests.CHANGE_POST_TEXT
+        self.post.save()
+        for url in (INDEX, GROUP, PROFILE):
+            with self.subTest(url=url):
+                self.assertNotEqual(
+                    feed_cache_key_for(self.client, url), feeds[url])
+                response = self.client.get(url)
+                self.assertContains(response, _config_tests.CHANGE_POST_TEXT)
+        self.assertEqual(
+            feed_cache_key_for(self.client, second_group),
+            feeds[second_group]
+        )
+
+    def test_version_is_shared_between_processes(self):
+        """Версию, повышенную в другом процессе, видит и этот"""
+        version = get_feed_version(INDEX_FEED)
+        bump_in_other_process(INDEX_FEED)
+        self.assertNotEqual(get_feed_version(INDEX_FEED), version)
+
+    def test_group_and_user_rename_refresh_other_feeds(self):
+        """Смена slug группы и имени автора видна в закешированных
+        лентах, версии которых не менялись"""
+        # Откат транзакции теста не вернёт снимок групп
+        self.addCleanup(groups.registry.reset)
+        group = Group.objects.get(pk=self.group.pk)
+        author = User.objects.get(pk=self.author.pk)
+        changes = (
+            (group, 'slug', 'moved', '/group/moved/'),
+            (author, 'username', 'renamed', '/profile/renamed/'),
+            (author, 'first_name', 'Лев', 'Лев'),
+        )
+        for instance, field, value, expected in changes:
+            with self.subTest(field=field):
+                self.client.get(INDEX)
+                setattr(instance, field, value)
+                instance.save()
+                self.assertContains(self.client.get(INDEX), expected)
+
+    def test_last_login_does_not_bump_shared_version(self):
+        """Вход пользователя не сбрасывает кеш всех лент"""
+        key = feed_cache_key_for(self.client, INDEX)
+        self.client.force_login(self.author)
+        self.assertEqual(feed_cache_key_for(self.client, INDEX), key)
+
+    def test_move_between_groups_bumps_old_group(self):
+        """Перенос поста в другую группу сбрасывает кеш старой группы"""
+        self.client.get(GROUP)
+        post = Post.objects.get(pk=self.post.pk)
+        post.group = self.groupSecond
+        post.save()
+        response = self.client.get(GROUP)
+        self.assertEqual(len(response.context['page_obj']), 0)
+        self.assertNotContains(response, _config_tests.POST_TEXT)
+
+
+class ConditionalGetTests(QueryDetectorMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username=_config_tests.USER_NAME)
+        cls.group = Group.objects.create(
+            title=_config_tests.GROUP_TITLE,
+            slug=_config_tests.SLUG,
+            description=_config_tests.DESCRIPTION
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            author=self.author,
+            text=_config_tests.POST_TEXT,
+            group=self.group
+        )
+        self.detail = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk})
+
+    def revalidate(self, url, client=None):
+        client = client or self.client
+        etag = client.get(url)['ETag']
+        return client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_page_is_not_modified(self):
+        """Неизменённая страница отвечает 304 без шаблона"""
+        for url in (INDEX, GROUP, PROFILE, self.detail):
+            with self.subTest(url=url):
+                response = self.revalidate(url)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b'')
+
+    def test_edit_changes_etag(self):
+        """Правка поста меняет ETag лент и страницы поста"""
+        for url in (INDEX, GROUP, PROFILE, self.detail):
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                self.post.text = _config_tests.CHANGE_POST_TEXT
+                self.post.save()
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_group_and_author_edit_changes_etag(self):
+        """Правка группы и имени автора меняет ETag их страниц, общей
+        ленты и страницы поста"""
+        profile_rss = reverse(
+            'posts:profile_rss', kwargs={'username': self.author.username})
+        group = Group.objects.get(pk=self.group.pk)
+        author = User.objects.get(pk=self.author.pk)
+        # Откат транзакции теста не вернёт снимок групп
+        self.addCleanup(groups.registry.reset)
+        changes = (
+            (GROUP, lambda: setattr(group, 'title', 'Новое название'),
+             group),
+            (self.detail, lambda: setattr(group, 'description', 'Новое'),
+             group),
+            (INDEX, lambda: setattr(group, 'slug', 'moved'), group),
+            (PROFILE, lambda: setattr(author, 'first_name', 'Лев'), author),
+            (profile_rss, lambda: setattr(author, 'last_name', 'Толстой'),
+             author),
+            (INDEX, lambda: setattr(author, 'first_name', 'Пётр'), author),
+            (self.detail, lambda: setattr(author, 'last_name', 'Первый'),
+             author),
+        )
+        for url, change, instance in changes:
+            with self.subTest(url=url, instance=instance):
+                etag = self.client.get(url)['ETag']
+                change()
+                instance.save()
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_etag_depends_on_page_and_user(self):
+        """ETag различается для разных страниц и пользователей"""
+        authorized_client = Client()
+        authorized_client.force_login(self.author)
+        etags = {
+            self.client.get(INDEX)['ETag'],
+            self.client.get(INDEX, {'page': 2})['ETag'],
+            authorized_client.get(INDEX)['ETag'],
+        }
+        self.assertEqual(len(etags), 3)
+
+    def test_missing_object_is_not_found(self):
+        """Для несуществующих объектов по-прежнему 404"""
+        urls = (
+            reverse('posts:group_list', kwargs={'slug': 'missing'}),
+            reverse('posts:profile', kwargs={'username': 'missing'}),
+            reverse('posts:post_detail', kwargs={'post_id': 0}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+
+def feed_cache_key_for(client, url):
+    return client.get(url).context['feed_cache_key']
+
+
+class PostSearchTests(OnCommitMixin, QueryDetectorMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username=_config_tests.USER_NAME)
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.posts = [
+                Post.objects.create(author=cls.author, text=text)
+                for text in (
+                    'Кошка спит на окне',
+                    'Собака и кошка гуляют, кошка довольна',
+                    'Про погоду',
+                )
+            ]
+        cls.SEARCH = reverse('posts:search')
+
+    def search(self, query, **params):
+        response = self.client.get(self.SEARCH, {'q': query, **params})
+        return response.context['page_obj']
+
+    def test_search_ranked_results(self):
+        """Поиск находит посты по словам и ставит релевантные выше"""
+        page_obj = self.search('кошка')
+        self.assertEqual(
+            [post.pk for post in page_obj],
+            [self.posts[1].pk, self.posts[0].pk]
+        )
+        self.assertEqual(page_obj.paginator.count, 2)
+
+    def test_search_follows_edit_and_delete(self):
+        """Индекс обновляется при правке и удалении поста"""
+        post = self.posts[2]
+        post.text = 'Про кошку и погоду'
+        with self.captureOnCommitCallbacks(execute=True):
+            post.save()
+        self.assertIn(post, list(self.search('кошку')))
+        with self.captureOnCommitCallbacks(execute=True):
+            post.delete()
+        self.assertEqual(len(self.search('погоду')), 0)
+
+    def test_search_paginates_and_keeps_query(self):
+        """Результаты разбиты на страницы, ссылки сохраняют запрос"""
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'Пингвин номер {i}')
+            for i in range(12)
+        )
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(len(self.search('пингвин')), settings.POSTS_ON_PAGE)
+        self.assertEqual(len(self.search('пингвин', page=2)), 2)
+        response = self.client.get(self.SEARCH, {'q': 'пингвин'})
+        self.assertContains(response, '?q=%D0%BF')
+
+    def test_search_syntax_is_escaped(self):
+        """Спецсимволы FTS5 в запросе не ломают страницу"""
+        for query in ('"', 'NOT', '*', 'кош* OR (', ''):
+            with self.subTest(query=query):
+                response = self.client.get(self.SEARCH, {'q': query})
+                self.assertEqual(response.status_code, 200)
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке идёт через полнотекстовый индекс"""
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'кошка'})
+        self.assertEqual(
+            {post.pk for post in response.context['cl'].result_list},
+            {self.posts[0].pk, self.posts[1].pk}
+        )
+
+
+class FollowTests(OnCommitMixin, QueryDetectorMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username=_config_tests.USER_NAME)
+        cls.reader = User.objects.create(username=_config_tests.RANDOM_USER)
+        cls.stranger = User.objects.create(username='stranger')
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.stranger_client = Client()
+        self.stranger_client.force_login(self.stranger)
+
+    def follow_feed(self, client):
+        return list(client.get(FOLLOW_INDEX).context['page_obj'])
+
+    def test_follow_and_unfollow(self):
+        """Пользователь подписывается и отписывается от автора"""
+        self.reader_client.get(FOLLOW)
+        self.assertTrue(Follow.objects.filter(
+            user=self.reader, author=self.author).exists())
+        self.assertEqual(self.author.stats.followers_count, 1)
+        self.reader_client.get(UNFOLLOW)
+        self.assertFalse(Follow.objects.exists())
+        self.assertEqual(
+            AuthorStats.objects.get(user=self.author).followers_count, 0)
+
+    def test_cannot_follow_self(self):
+        """На самого себя подписаться нельзя"""
+        client = Client()
+        client.force_login(self.author)
+        client.get(FOLLOW)
+        self.assertFalse(Follow.objects.exists())
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост попадает в ленту подписчика и не попадает к
+        остальным"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        with self.captureOnCommitCallbacks(execute=True):
+            post = Post.objects.create(
+                author=self.author, text=_config_tests.POST_TEXT)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=post).exists())
+        self.assertEqual(self.follow_feed(self.reader_client), [post])
+        self.assertEqual(self.follow_feed(self.stranger_client), [])
+
+    def test_follow_backfills_and_unfollow_clears_timeline(self):
+        """Подписка добавляет прошлые посты автора, отписка убирает их"""
+        posts = [
+            Post.objects.create(author=self.author, text=str(i))
+            for i in range(3)
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.reader_client.get(FOLLOW)
+        self.assertEqual(
+            self.follow_feed(self.reader_client), posts[::-1])
+        self.reader_client.get(UNFOLLOW)
+        self.assertFalse(TimelineEntry.objects.exists())
+
+    def test_backfill_after_unfollow_is_skipped(self):
+        """Подписка не заполняет ленту в запросе, а задача после отписки
+        ничего не добавляет"""
+        Post.objects.create(author=self.author, text=_config_tests.POST_TEXT)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.reader_client.get(FOLLOW)
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.reader_client.get(UNFOLLOW)
+        for callback in callbacks:
+            callback()
+        self.assertFalse(TimelineEntry.objects.exists())
+
+    @override_settings(FANOUT_FOLLOWERS_LIMIT=1)
+    def test_unfollow_queues_followers_backfill(self):
+        """Автор, опустившийся до порога, раскладывается подписчикам
+        фоновой задачей, а не в запросе отписки"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.stranger, author=self.author)
+        post = Post.objects.create(
+            author=self.author, text=_config_tests.POST_TEXT)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.stranger_client.get(UNFOLLOW)
+        self.assertFalse(TimelineEntry.objects.exists())
+        for callback in callbacks:
+            callback()
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=post).exists())
+
+    @override_settings(FANOUT_FOLLOWERS_LIMIT=1)
+    def test_popular_author_is_merged_on_read(self):
+        """Посты популярного автора не раскладываются, а читаются при
+        чтении и сливаются с материализованной лентой"""
+        other = User.objects.create(username='other')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.stranger, author=self.author)
+        Follow.objects.create(user=self.reader, author=other)
+        with self.captureOnCommitCallbacks(execute=True):
+            old = Post.objects.create(author=self.author, text='old')
+            middle = Post.objects.create(author=other, text='middle')
+            new = Post.objects.create(author=self.author, text='new')
+        self.assertFalse(TimelineEntry.objects.filter(
+            author=self.author).exists())
+        self.assertTrue(TimelineEntry.objects.filter(post=middle).exists())
+        self.assertEqual(
+            self.follow_feed(self.reader_client), [new, middle, old])
+
+
+class GroupIndexTests(QueryDetectorMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username=_config_tests.USER_NAME)
+        Group.objects.bulk_create(
+            Group(title=f'Группа {i:02}', slug=f'group-{i}',
+                  description=_config_tests.DESCRIPTION)
+            for i in range(25)
+        )
+        cls.groups = list(Group.objects.order_by('title', 'pk'))
+        cls.busy = cls.groups[0]
+        for i in range(3):
+            cls.last = Post.objects.create(
+                author=cls.author, group=cls.busy, text=str(i))
+
+    def setUp(self):
+        cache.clear()
+
+    def rows(self, cursor=''):
+        return self.client.get(
+            GROUP_INDEX, {'cursor': cursor}).context['page_obj']
+
+    def test_group_counts_and_last_post(self):
+        """Группы показывают число постов и дату последнего"""
+        busy, empty = self.rows()[:2]
+        self.assertEqual(busy['posts_count'], 3)
+        self.assertEqual(busy['last_pub_date'], self.last.pub_date)
+        self.assertEqual(empty['posts_count'], 0)
+        self.assertIsNone(empty['last_pub_date'])
+
+    def test_group_pages_cover_directory(self):
+        """Курсоры проходят все группы по алфавиту"""
+        first = self.rows()
+        second = self.rows(first.next_cursor)
+        self.assertIsNone(second.next_cursor)
+        self.assertEqual(
+            [row['pk'] for row in [*first, *second]],
+            [group.pk for group in self.groups]
+        )
+
+    def test_group_page_is_cached(self):
+        """Повторный запрос страницы не обращается к группам"""
+        self.rows()
+        with CaptureQueriesContext(connection) as queries:
+            self.rows()
+        self.assertFalse([
+            q for q in queries.captured_queries
+            if 'posts_group' in q['sql']
+        ])
+
+    def test_invalid_cursors_share_cache_key(self):
+        """Битые курсоры не заводят новых ключей кеша"""
+        self.rows()
+        for cursor in ('garbage', 'x' * 5000, self.rows().next_cursor[1:]):
+            with self.subTest(cursor=cursor[:20]):
+                with CaptureQueriesContext(connection) as queries:
+                    page = self.rows(cursor)
+                self.assertEqual(page[0]['pk'], self.groups[0].pk)
+                self.assertFalse([
+                    q for q in queries.captured_queries
+                    if 'posts_group' in q['sql']
+                ])
+
+
+class AuthorCacheTests(QueryDetectorMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(
+            username=_config_tests.USER_NAME, first_name='Лев')
+
+    def setUp(self):
+        cache.clear()
+
+    def user_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        return response, [
+            q for q in queries.captured_queries if 'auth_user' in q['sql']
+        ]
+
+    def test_profile_author_is_cached(self):
+        """Повторный заход в профиль не читает таблицу пользователей"""
+        self.client.get(PROFILE)
+        response, queries = self.user_queries(PROFILE)
+        self.assertEqual(queries, [])
+        self.assertEqual(response.context['author'], self.author)
+        self.assertContains(response, 'Лев')
+
+    def test_unknown_username_is_cached(self):
+        """Несуществующее имя отвечает 404 без повторных запросов, а
+        появившийся пользователь сбрасывает отметку"""
+        url = reverse('posts:profile', kwargs={'username': 'nobody'})
+        self.client.get(url)
+        response, queries = self.user_queries(url)
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(queries, [])
+        User.objects.create(username='nobody')
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_user_change_invalidates_cache(self):
+        """Смена имени и удаление пользователя сбрасывают кеш"""
+        user = User.objects.create(username='before')
+        before = reverse('posts:profile', kwargs={'username': 'before'})
+        after = reverse('posts:profile', kwargs={'username': 'after'})
+        self.client.get(before)
+        user.username = 'after'
+        user.save()
+        self.assertEqual(self.client.get(before).status_code, 404)
+        self.assertEqual(self.client.get(after).status_code, 200)
+        user.delete()
+        self.assertEqual(self.client.get(after).status_code, 404)
+
+    def test_change_in_other_process_refreshes_cache(self):
+        """Записи кеша авторов перечитываются по общей версии, даже если
+        пользователя изменил другой процесс"""
+        self.client.get(PROFILE)
+        User.objects.filter(pk=self.author.pk).update(first_name='Пётр')
+        self.assertContains(self.client.get(PROFILE), 'Лев')
+        bump_in_other_process(authors.AUTHORS)
+        self.assertContains(self.client.get(PROFILE), 'Пётр')
+
+
+class GroupRegistryTests(QueryDetectorMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username=_config_tests.USER_NAME)
+        cls.group = Group.objects.create(
+            title=_config_tests.GROUP_TITLE,
+            slug=_config_tests.SLUG,
+            description=_config_tests.DESCRIPTION
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text=_config_tests.POST_TEXT)
+
+    def setUp(self):
+        cache.clear()
+        groups.registry.reset()
+        groups.registry.by_id()
+
+    def group_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        return response, [
+            q for q in queries.captured_queries if 'posts_group' in q['sql']
+        ]
+
+    def test_feeds_take_groups_from_registry(self):
+        """Ленты и страница группы не обращаются к таблице групп"""
+        for url in (INDEX, GROUP, PROFILE):
+            with self.subTest(url=url):
+                response, queries = self.group_queries(url)
+                self.assertEqual(queries, [])
+                self.assertEqual(
+                    response.context['page_obj'][0].group, self.group)
+
+    def test_group_change_refreshes_registry(self):
+        """Изменение группы видно сразу, удалённая группа - 404"""
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'Новое название'
+        group.save()
+        response = self.client.get(GROUP)
+        self.assertEqual(response.context['group'].title, 'Новое название')
+        group.delete()
+        self.assertEqual(self.client.get(GROUP).status_code, 404)
+
+    def test_shared_version_refreshes_other_processes(self):
+        """Снимок перечитывается по общей версии, даже если группу
+        изменили в другом процессе без сигналов этого"""
+        Group.objects.filter(pk=self.group.pk).update(slug='moved')
+        self.assertEqual(self.client.get(GROUP).status_code, 200)
+        bump_in_other_process(groups.GROUPS)
+        self.assertEqual(self.client.get(GROUP).status_code, 404)
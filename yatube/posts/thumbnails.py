@@ -0,0 +1,95 @@
+"""Миниатюры картинок постов.
+
+Варианты для ленты и страницы поста готовит фоновая задача после
+сохранения поста с новой картинкой. Файлы миниатюр лежат в хранилище, а
+их индекс - в key-value хранилище sorl-thumbnail, поэтому шаблон только
+читает готовый вариант по ключу и никогда не ресайзит картинку сам.
+"""
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+# Вариант: геометрия и параметры sorl-thumbnail
+VARIANTS = {
+    'feed': ('960x339', {'crop': 'center', 'upscale': True}),
+    'detail': ('960', {}),
+}
+
+
+class CachedThumbnailBackend(ThumbnailBackend):
+    """Бэкенд, который умеет найти миниатюру, не создавая её."""
+
+    def prepare_options(self, source, options):
+        # Те же значения по умолчанию, что в ThumbnailBackend.get_thumbnail:
+        # от них зависит имя файла миниатюры
+        options = dict(options)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        return options
+
+    def get_thumbnail_file(self, file_, geometry_string, **options):
+        """Файл миниатюры по её имени; само хранилище не трогается."""
+        source = ImageFile(file_)
+        options = self.prepare_options(source, options)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+    def get_cached_thumbnail(self, file_, geometry_string, **options):
+        return default.kvstore.get(
+            self.get_thumbnail_file(file_, geometry_string, **options))
+
+
+backend = CachedThumbnailBackend()
+
+
+def cached_thumbnail(image, variant):
+    """Готовая миниатюра варианта или None."""
+    geometry, options = VARIANTS[variant]
+    return backend.get_cached_thumbnail(image.name, geometry, **options)
+
+
+def prefetch(posts, variant):
+    """Загружает в кеш key-value хранилища записи миниатюр постов.
+
+    На холодном кеше каждая картинка ленты иначе стоит отдельного
+    запроса к таблице хранилища; здесь это один запрос на страницу.
+    """
+    kvstore = default.kvstore
+    if not isinstance(kvstore, cached_db_kvstore.KVStore):
+        return
+    geometry, options = VARIANTS[variant]
+    keys = [
+        add_prefix(backend.get_thumbnail_file(
+            post.image.name, geometry, **options).key)
+        for post in posts if post.image
+    ]
+    missing = set(keys) - set(kvstore.cache.get_many(keys))
+    if not missing:
+        return
+    values = dict.fromkeys(missing, cached_db_kvstore.EMPTY_VALUE)
+    values.update(KVStoreModel.objects.filter(
+        key__in=missing).values_list('key', 'value'))
+    kvstore.cache.set_many(
+        values, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT)
+
+
+def generate(name):
+    """Создаёт все варианты картинки."""
+    for geometry, options in VARIANTS.values():
+        backend.get_thumbnail(name, geometry, **options)
+
+
+def delete(name):
+    """Удаляет картинку, её миниатюры и их записи в хранилище."""
+    backend.delete(name)
@@ -0,0 +1,150 @@
+"""Лента подписок.
+
+Пост обычного автора при публикации раскладывается пачками в
+TimelineEntry его подписчиков (fan-out on write), и лента читателя
+читается проходом по индексу (user, -pub_date). Авторам, у которых
+подписчиков больше FANOUT_FOLLOWERS_LIMIT, раскладка обошлась бы дороже
+всех чтений: их посты подмешиваются в ленту при чтении (fan-out on
+read).
+"""
+import heapq
+from collections import defaultdict
+
+from django.conf import settings
+
+from .models import AuthorStats, Follow, Post, TimelineEntry
+
+
+def celebrity_ids(author_ids):
+    """Авторы из author_ids, чьи посты не раскладываются по лентам."""
+    return set(AuthorStats.objects.filter(
+        user_id__in=author_ids,
+        followers_count__gt=settings.FANOUT_FOLLOWERS_LIMIT
+    ).values_list('user_id', flat=True))
+
+
+def iter_followers(author_id):
+    """Пачки id подписчиков автора по FANOUT_BATCH_SIZE."""
+    batch_size = settings.FANOUT_BATCH_SIZE
+    last_id = 0
+    while True:
+        batch = list(
+            Follow.objects.filter(author_id=author_id, user_id__gt=last_id)
+            .order_by('user_id').values_list('user_id', flat=True)
+            [:batch_size]
+        )
+        if not batch:
+            return
+        yield batch
+        last_id = batch[-1]
+
+
+def fan_out(rows):
+    """Раскладывает посты по лентам подписчиков.
+
+    rows - кортежи (id поста, id автора, дата публикации).
+    """
+    by_author = defaultdict(list)
+    for post_id, author_id, pub_date in rows:
+        by_author[author_id].append((post_id, pub_date))
+    skipped = celebrity_ids(by_author)
+    for author_id, posts in by_author.items():
+        if author_id in skipped:
+            continue
+        for followers in iter_followers(author_id):
+            TimelineEntry.objects.bulk_create(
+                (
+                    TimelineEntry(user_id=user_id, post_id=post_id,
+                                  author_id=author_id, pub_date=pub_date)
+                    for user_id in followers
+                    for post_id, pub_date in posts
+                ),
+                ignore_conflicts=True
+            )
+
+
+def fan_out_after(last_pk):
+    """Раскладывает посты с id больше last_pk, например после
+    bulk_create."""
+    fan_out(Post.objects.filter(pk__gt=last_pk).order_by().values_list(
+        'pk', 'author_id', 'pub_date').iterator())
+
+
+def recent_posts(author_id):
+    return Post.objects.filter(author_id=author_id).values_list(
+        'pk', 'pub_date')[:settings.FOLLOW_BACKFILL_POSTS]
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту нового подписчика свежие посты автора."""
+    if author_id in celebrity_ids([author_id]):
+        return
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post_id=post_id,
+                          author_id=author_id, pub_date=pub_date)
+            for post_id, pub_date in recent_posts(author_id)
+        ),
+        ignore_conflicts=True
+    )
+
+
+def backfill_followers(author_id):
+    """Раскладывает свежие посты автора всем подписчикам.
+
+    Нужно, когда автор опустился ниже FANOUT_FOLLOWERS_LIMIT: посты,
+    опубликованные, пока он читался при чтении, ни в одной ленте нет.
+    """
+    fan_out(
+        (post_id, author_id, pub_date)
+        for post_id, pub_date in recent_posts(author_id)
+    )
+
+
+def remove(user_id, author_id):
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+class FollowFeed:
+    """Лента подписок пользователя для Paginator.
+
+    Сливает материализованную ленту с постами авторов, читаемых при
+    чтении. Страница - по одному запросу к каждому источнику за id и
+    один запрос постов по списку id.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self.pulled_ids = celebrity_ids(
+            Follow.objects.filter(user=user).values('author_id'))
+
+    def timeline(self):
+        # Записи, разложенные до того, как автор стал читаться при
+        # чтении, берём из второго источника
+        return TimelineEntry.objects.filter(user=self.user).exclude(
+            author_id__in=self.pulled_ids).order_by('-pub_date', '-post_id')
+
+    def pulled(self):
+        return Post.objects.filter(author_id__in=self.pulled_ids).order_by(
+            '-pub_date', '-pk')
+
+    def count(self):
+        count = self.timeline().count()
+        if self.pulled_ids:
+            count += self.pulled().count()
+        return count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        sources = [self.timeline().values_list('pub_date', 'post_id')]
+        if self.pulled_ids:
+            sources.append(self.pulled().values_list('pub_date', 'pk'))
+        merged = heapq.merge(
+            *(source[:index.stop] for source in sources), reverse=True)
+        ids = [post_id for _, post_id in merged][index]
+        posts = Post.objects.for_feed().in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
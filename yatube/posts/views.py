@@ -1,66 +1,292 @@
+import hashlib
+from urllib.parse import urlencode
+
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404, redirect
+from django.views.decorators.http import condition
+
+from core.routers import replica_reads
 
-from .models import Group, Post, User
+from . import export
+from .archive import AuthorFeed, get_post
+from .authors import get_author, get_author_or_404
+from .cache import (INDEX_FEED, author_feed, feed_cache_key, group_feed,
+                    read_version, shared_version)
+from .models import (ArchivedPost, Follow, Group, Post, User,
+                     get_posts_count)
 from .forms import PostForm
+from .groups import registry
+from .paginators import (CachedCountPaginator, CursorPage, CursorPaginator,
+                         ElidedPaginator, MergedCursorPaginator)
+from .search import SearchResults
+from .timeline import FollowFeed
 
 POSTS_ON_PAGE: int = 10
+GROUPS_ON_PAGE: int = 20
 
 
-def paginator_object(request, post_list):
-    paginator = Paginator(post_list, POSTS_ON_PAGE)
+def paginator_object(request, post_list, feed=None, approximate=False):
+    # Параметр cursor включает keyset-паджинацию: без COUNT(*) и OFFSET,
+    # глубокие страницы открываются так же быстро, как первая
+    if 'cursor' in request.GET:
+        if isinstance(post_list, AuthorFeed):
+            paginator = MergedCursorPaginator(
+                post_list.sources(), POSTS_ON_PAGE)
+        else:
+            paginator = CursorPaginator(post_list, POSTS_ON_PAGE)
+        return paginator.get_page(request.GET.get('cursor'))
+    # Число записей для номеров страниц берём из кеша по версии ленты
+    paginator = CachedCountPaginator(
+        post_list, POSTS_ON_PAGE, feed=feed, approximate=approximate
+    )
     # Из URL извлекаем номер запрошенной страницы - это значение параметра page
-    # Получаем набор записей для страницы с запрошенным номером
+    # Получаем набор записей для страницы с запрошенным номером; кроме
+    # постов страница несёт elided_page_range - окно номеров для навигации
     page_number = request.GET.get('page')
     return paginator.get_page(page_number)
 
 
+def feed_context(request, feed, post_list, approximate=False):
+    """Страница ленты и ключ версионного кеша её списка постов."""
+    page_obj = paginator_object(request, post_list, feed, approximate)
+    return {
+        'page_obj': page_obj,
+        'feed_cache_key': feed_cache_key(feed, page_obj),
+        'feed_cache_timeout': settings.FEED_CACHE_TIMEOUT,
+    }
+
+
+def page_etag(request, *parts):
+    """ETag страницы: версии данных, параметры запроса и пользователь.
+
+    Пользователь входит в ETag, потому что от него зависит шапка сайта.
+    """
+    user = request.user.pk if request.user.is_authenticated else ''
+    raw = ':'.join(map(str, (*parts, request.GET.urlencode(), user)))
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def feed_etag(request, feed):
+    # Версия ленты меняется при любом сохранении и удалении её постов,
+    # общая - при изменении групп и имён авторов на её страницах
+    return page_etag(request, feed, read_version(feed), shared_version())
+
+
+def index_etag(request):
+    return feed_etag(request, INDEX_FEED)
+
+
+def group_etag(request, slug):
+    group = registry.get_by_slug(slug)
+    # Без ETag представление само ответит 404
+    return group and feed_etag(request, group_feed(group.pk))
+
+
+def profile_etag(request, username):
+    author = get_author(username)
+    return author and feed_etag(request, author_feed(author.pk))
+
+
+def post_etag(request, post_id):
+    post = Post.objects.filter(pk=post_id).values_list(
+        'updated_at', 'author_id').first()
+    if post is None:
+        # Архивный пост не меняется, а перенос в архив повышает версию
+        # ленты автора
+        post = ArchivedPost.objects.filter(pk=post_id).values_list(
+            'updated_at', 'author_id').first()
+    if post is None:
+        return None
+    updated_at, author_id = post
+    # Версия ленты автора меняется вместе с его счётчиком постов, общая -
+    # с группой поста и именем автора
+    version = read_version(author_feed(author_id))
+    return page_etag(
+        request, updated_at.isoformat(), version, shared_version())
+
+
+@replica_reads
+@condition(etag_func=index_etag)
 def index(request):
     title = 'Последние обновления на сайте'
-    post_list = Post.objects.all()
-    page_obj = paginator_object(request, post_list)
+    post_list = Post.objects.for_feed()
     context = {
         'title': title,
-        'page_obj': page_obj,
+        # Общая лента самая длинная, точное число её страниц не нужно
+        **feed_context(request, INDEX_FEED, post_list, approximate=True),
     }
     return render(request, 'posts/index.html', context)
 
 
+@replica_reads
+@condition(etag_func=group_etag)
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
+    group = registry.get_by_slug(slug)
+    if group is None:
+        raise Http404('Группа не найдена')
     title = 'Здесь будет информация о группах проекта Yatube'
-    post_list = group.posts.all()
-    page_obj = paginator_object(request, post_list)
+    post_list = group.posts.for_feed()
     context = {
         'group': group,
         'title': title,
-        'page_obj': page_obj,
+        **feed_context(request, group_feed(group.pk), post_list),
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@replica_reads
+@condition(etag_func=profile_etag)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    post_list = Post.objects.filter(author=author)
-    page_obj = paginator_object(request, post_list)
+    # Автор из кеша: страница сразу начинается с запроса постов
+    author = get_author_or_404(username)
+    # И номерные страницы, и курсор листают таблицу постов вместе с
+    # архивом
+    post_list = AuthorFeed(author)
+    following = (
+        request.user.is_authenticated
+        and request.user != author
+        and Follow.objects.filter(user=request.user, author=author).exists()
+    )
     context = {
-        'page_obj': page_obj,
+        **feed_context(request, author_feed(author.pk), post_list),
         'author': author,
+        'posts_count': get_posts_count(author),
+        'following': following,
     }
     return render(request, 'posts/profile.html', context)
 
 
+def group_index(request):
+    cursor = request.GET.get('cursor', '')
+    # Число постов и дата последнего - коррелированные подзапросы по
+    # индексу (group, -pub_date): СУБД считает их только для групп
+    # текущей страницы, а не агрегирует всю таблицу постов
+    posts = Post.objects.filter(group=OuterRef('pk')).order_by()
+    groups = Group.objects.annotate(
+        posts_count=Coalesce(Subquery(
+            posts.values('group').annotate(count=Count('pk'))
+            .values('count'),
+            output_field=IntegerField()
+        ), 0),
+        last_pub_date=Subquery(
+            posts.order_by('-pub_date').values('pub_date')[:1]),
+    ).values(
+        'pk', 'title', 'slug', 'description',
+        'posts_count', 'last_pub_date'
+    )
+    paginator = CursorPaginator(
+        groups, GROUPS_ON_PAGE, ordering=('title', 'pk'))
+    cache_key = f'group_index:{paginator.cache_key(cursor)}'
+    cached = cache.get(cache_key)
+    if cached is None:
+        page = paginator.get_page(cursor)
+        cached = (page.object_list, page.next_cursor, page.previous_cursor)
+        cache.set(cache_key, cached, settings.GROUP_INDEX_CACHE_TIMEOUT)
+    rows, next_cursor, previous_cursor = cached
+    context = {
+        'title': 'Группы',
+        'page_obj': CursorPage(
+            rows, None, next_cursor, previous_cursor, cursor),
+    }
+    return render(request, 'posts/group_index.html', context)
+
+
+def export_response(request, querysets, filename):
+    fmt = request.GET.get('format')
+    if fmt not in export.FORMATS:
+        fmt = 'jsonl'
+    response = StreamingHttpResponse(
+        export.export(querysets, fmt),
+        content_type=export.FORMATS[fmt]
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{filename}.{fmt}"'
+    )
+    return response
+
+
+# Полная выгрузка отдаёт всю историю разом, поэтому она только для
+# самого автора и персонала, а не для выкачивания сайта
+@login_required
+def profile_export(request, username):
+    author = get_author_or_404(username)
+    if request.user.pk != author.pk and not request.user.is_staff:
+        raise PermissionDenied
+    return export_response(
+        request, export.sources(author_id=author.pk), username)
+
+
+@login_required
+def group_export(request, slug):
+    if not request.user.is_staff:
+        raise PermissionDenied
+    group = get_object_or_404(Group, slug=slug)
+    return export_response(
+        request, export.sources(group_id=group.pk), slug)
+
+
+@replica_reads
+@condition(etag_func=post_etag)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    post_number = post.author.posts.count()
+    post = get_post(post_id)
+    if post is None:
+        raise Http404('Пост не найден')
     context = {
         'post': post,
-        'post_number': post_number
+        'posts_count': get_posts_count(post.author),
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def post_search(request):
+    query = request.GET.get('q', '').strip()
+    # Результаты уже упорядочены по релевантности, постранично их
+    # достаёт сам SearchResults запросами к индексу FTS5
+    paginator = ElidedPaginator(SearchResults(query), POSTS_ON_PAGE)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    context = {
+        'title': 'Поиск по записям',
+        'query': query,
+        'page_obj': page_obj,
+        # Ссылки паджинатора сохраняют поисковый запрос
+        'page_query': urlencode({'q': query}) + '&',
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@login_required
+def follow_index(request):
+    # Лента своя у каждого пользователя, поэтому без кеша фрагментов
+    paginator = ElidedPaginator(FollowFeed(request.user), POSTS_ON_PAGE)
+    context = {
+        'title': 'Посты авторов, на которых вы подписаны',
+        'page_obj': paginator.get_page(request.GET.get('page')),
+    }
+    return render(request, 'posts/follow.html', context)
+
+
+@login_required
+def profile_follow(request, username):
+    author = get_object_or_404(User, username=username)
+    if author != request.user:
+        Follow.objects.get_or_create(user=request.user, author=author)
+    return redirect('posts:profile', username)
+
+
+@login_required
+def profile_unfollow(request, username):
+    author = get_object_or_404(User, username=username)
+    # delete() у QuerySet тоже отправляет сигналы post_delete
+    Follow.objects.filter(user=request.user, author=author).delete()
+    return redirect('posts:profile', username)
+
+
 @login_required
 def post_create(request):
     form = PostForm(request.POST or None,
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+import sys
 
 EMPTY_VALUE_DISPLAY = '-пусто-'
 
@@ -45,16 +46,20 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'sorl.thumbnail',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.PerformanceMiddleware',
+    'core.middleware.QueryDetectorMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.routers.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -63,7 +68,8 @@ ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates, который замеряет рендеринг для Server-Timing
+        'BACKEND': 'core.backends.TimedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -88,8 +94,100 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # Сколько секунд ждать, пока другой процесс держит запись
+        'OPTIONS': {'timeout': 20},
+        # Соединение живёт между запросами, а не открывается заново
+        'CONN_MAX_AGE': 60,
     }
 }
+# Реплики только для чтения, см. core.routers. Локально это копии
+# файла основной БД: YATUBE_REPLICAS=2 и python manage.py sync_replicas
+DATABASE_REPLICAS = []
+for number in range(1, int(os.environ.get('YATUBE_REPLICAS', 0)) + 1):
+    alias = f'replica{number}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'NAME': os.path.join(BASE_DIR, f'db.{alias}.sqlite3'),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+# С реплик читаются только модели этих приложений
+DATABASE_REPLICA_APPS = ('posts',)
+# Сколько секунд после записи сессия читает только основную БД
+REPLICA_STICKY_SECONDS: int = 10
+# Общий для процессов кеш, где лежит поколение копии реплик
+REPLICA_GENERATION_CACHE_ALIAS = 'versions'
+
+# PRAGMA каждого нового соединения SQLite, см. core.db
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'mmap_size': 256 * 1024 * 1024,
+    # Отрицательное значение - размер кеша страниц в КиБ
+    'cache_size': -16000,
+    'temp_store': 'memory',
+}
+
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Версии лент (posts.cache): от них зависят ключи фрагментов,
+    # счётчики страниц, ETag и снимок групп, поэтому кеш должен быть
+    # общим для всех процессов сервера. Файловый кеш общий для процессов
+    # одной машины; если машин несколько - memcached или Redis. Запись
+    # в VersionFileCache не перечисляет каталог, см. core.cache.
+    'versions': {
+        'BACKEND': 'core.cache.VersionFileCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'versions'),
+        'TIMEOUT': None,
+    },
+}
+FEED_VERSION_CACHE_ALIAS = 'versions'
+# Ключи фрагментов лент версионные, поэтому их можно хранить долго
+FEED_CACHE_TIMEOUT: int = 60 * 60
+# Дальше этого числа записей приблизительный счётчик лент не считает
+APPROXIMATE_COUNT_LIMIT: int = 10000
+# Кеш авторов по username; несуществующие имена помним недолго
+AUTHOR_CACHE_TIMEOUT: int = 60 * 60
+AUTHOR_CACHE_MISS_TIMEOUT: int = 60
+# Счётчики в каталоге групп обновляются не чаще этого интервала
+GROUP_INDEX_CACHE_TIMEOUT: int = 60
+
+# Доля запросов, замеры которых пишутся в лог core.performance
+PERF_LOG_SAMPLE_RATE: float = 0.01
+# manage.py test или pytest: выборочные замеры в консоль не пишем
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+# Сколько раз один запрос может выполниться из одного места кода или
+# шаблона, прежде чем детектор сочтёт его N+1
+QUERY_DETECTOR_THRESHOLD: int = 3
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core.performance': {
+            'handlers': ['console'],
+            'level': 'WARNING' if TESTING else 'INFO',
+            'propagate': False,
+        },
+        'core.queries': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+        'core.tasks': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
 
 
 # Password validation
@@ -133,6 +231,33 @@ STATIC_URL = '/static/'
 
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 
+MEDIA_URL = '/media/'
+
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Загрузки больше этого размера Django пишет во временный файл, а не
+# держит в памяти процесса
+FILE_UPLOAD_MAX_MEMORY_SIZE: int = 1024 * 1024
+# Картинки больше этого размера форма поста не принимает
+POST_IMAGE_MAX_SIZE: int = 5 * 1024 * 1024
+# Индекс готовых миниатюр: БД с кешем поверх неё
+THUMBNAIL_KVSTORE = 'sorl.thumbnail.kvstores.cached_db_kvstore.KVStore'
+THUMBNAIL_PRESERVE_FORMAT = True
+
+# Посты старше этого числа дней archive_posts переносит в архив
+ARCHIVE_AFTER_DAYS: int = 365
+# Постов за одну транзакцию переноса
+ARCHIVE_BATCH_SIZE: int = 500
+
+# Фоновые задачи (core.tasks). В разработке и тестах они выполняются
+# сразу, без очереди и команды run_tasks
+TASKS_EAGER: bool = DEBUG
+TASK_MAX_ATTEMPTS: int = 5
+# Пауза перед повтором, секунды; удваивается с каждой попыткой
+TASK_RETRY_DELAY: int = 10
+# Задача, взятая обработчиком раньше, считается брошенной
+TASK_LOCK_TIMEOUT: int = 10 * 60
+
 DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
 
 LOGIN_URL = 'users:login'
@@ -144,3 +269,13 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 POSTS_ON_PAGE: int = 10
 POST_LIMIT: int = 15
+# Записей в лентах RSS и Atom
+SYNDICATION_POSTS: int = 20
+
+# Посты авторов с большим числом подписчиков не раскладываются по
+# лентам подписок при публикации, а подмешиваются при чтении
+FANOUT_FOLLOWERS_LIMIT: int = 10000
+# Сколько подписчиков обрабатывать за одну вставку в ленты
+FANOUT_BATCH_SIZE: int = 1000
+# Сколько свежих постов автора попадает в ленту нового подписчика
+FOLLOW_BACKFILL_POSTS: int = 100